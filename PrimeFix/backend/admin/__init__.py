@@ -1 +1 @@
-# Пакет admin: функционал admin_settings удалён.
+# Пакет admin: служебные эндпоинты админ-панели (состояние пула БД).
@@ -0,0 +1,19 @@
+"""API админа: служебная информация (защищённый JWT)."""
+from fastapi import APIRouter, Depends
+
+from backend.admin.schema import DbPoolResponse
+from backend.auth.dependencies import get_current_admin
+from backend.auth.model import Admin
+from backend.core.database import async_engine, engine
+from backend.core.pool import pool_status
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/db-pool", response_model=DbPoolResponse)
+async def get_db_pool(admin: Admin = Depends(get_current_admin)):
+    """Состояние пулов соединений этого процесса (для подбора DB_POOL_*)."""
+    return DbPoolResponse(
+        api=pool_status(async_engine.sync_engine.pool),
+        background=pool_status(engine.pool),
+    )
@@ -0,0 +1,25 @@
+"""Pydantic-схемы служебных эндпоинтов админки."""
+from pydantic import BaseModel
+
+
+class PoolStatus(BaseModel):
+    """Состояние пула соединений одного движка."""
+
+    pool_size: int
+    max_overflow: int
+    timeout_s: float
+    checked_out: int
+    idle: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    wait_avg_ms: float
+    wait_max_ms: float
+    wait_total_ms: float
+
+
+class DbPoolResponse(BaseModel):
+    """Пулы процесса: api — асинхронный движок запросов, background — синхронный."""
+
+    api: PoolStatus
+    background: PoolStatus
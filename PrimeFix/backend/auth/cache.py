@@ -0,0 +1,135 @@
+"""Кэш авторизации: декодированные JWT и записи администраторов.
+
+Каждый защищённый запрос проходит через get_current_admin: проверка
+подписи HS256 и SELECT администратора по ID. Оба результата кэшируются
+в памяти процесса с ограничением по размеру и времени жизни:
+
+- токен → ID администратора (не дольше срока действия токена);
+- ID → снимок полей администратора;
+- число администраторов для /auth/check-admin-exists.
+
+AdminRepository сбрасывает записи при изменении и удалении администратора.
+В другом воркере изменение станет видно не позже чем через AUTH_CACHE_TTL
+секунд.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from backend.auth.model import Admin
+from backend.core.config import get_settings
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU-кэш с временем жизни записей."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_settings = get_settings()
+_token_cache = TTLCache(_settings.AUTH_CACHE_SIZE, _settings.AUTH_CACHE_TTL)
+_admin_cache = TTLCache(_settings.AUTH_CACHE_SIZE, _settings.AUTH_CACHE_TTL)
+_count_cache = TTLCache(1, _settings.AUTH_CACHE_TTL)
+
+
+# ── Токены ───────────────────────────────────────────────────────────
+
+def get_token_admin_id(token: str) -> int | None:
+    """ID администратора из ранее проверенного токена."""
+    return _token_cache.get(token)
+
+
+def put_token_admin_id(token: str, admin_id: int, exp: float | None) -> None:
+    """Запомнить проверенный токен, но не дольше его срока действия."""
+    ttl = None
+    if exp is not None:
+        ttl = float(exp) - time.time()
+        if ttl <= 0:
+            return
+    _token_cache.put(token, admin_id, ttl)
+
+
+# ── Администраторы ───────────────────────────────────────────────────
+
+def get_admin(admin_id: int) -> Admin | None:
+    """Администратор из кэша — отсоединённый от сессии экземпляр."""
+    values = _admin_cache.get(admin_id)
+    if values is None:
+        return None
+    admin = Admin(**values)
+    make_transient_to_detached(admin)
+    return admin
+
+
+def put_admin(admin: Admin) -> None:
+    """Запомнить снимок полей администратора."""
+    values = {attr.key: getattr(admin, attr.key) for attr in inspect(Admin).column_attrs}
+    _admin_cache.put(admin.id, values)
+
+
+def invalidate_admin(admin_id: int) -> None:
+    """Сбросить кэш администратора (после изменения или удаления)."""
+    _admin_cache.pop(admin_id)
+    _count_cache.clear()
+
+
+# ── Число администраторов ────────────────────────────────────────────
+
+def get_admin_count() -> int | None:
+    return _count_cache.get("count")
+
+
+def put_admin_count(count: int) -> None:
+    _count_cache.put("count", count)
+
+
+def invalidate_admin_count() -> None:
+    _count_cache.clear()
+
+
+def clear_auth_cache() -> None:
+    """Полный сброс кэша авторизации."""
+    _token_cache.clear()
+    _admin_cache.clear()
+    _count_cache.clear()
@@ -3,8 +3,9 @@ import logging
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.auth import cache
 from backend.auth.model import Admin
 from backend.auth.repository import AdminRepository
 from backend.auth.utils import decode_access_token
@@ -17,7 +18,7 @@ security = HTTPBearer()
 
 async def get_current_admin(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> Admin:
     """Получение текущего администратора из JWT-токена."""
     if not credentials:
@@ -27,7 +28,25 @@ async def get_current_admin(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    payload = decode_access_token(credentials.credentials)
+    token = credentials.credentials
+    admin_id = cache.get_token_admin_id(token)
+    if admin_id is None:
+        admin_id = _admin_id_from_token(token)
+
+    admin = await AdminRepository.get_active_cached(db, admin_id)
+    if admin is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Администратор не найден или неактивен",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return admin
+
+
+def _admin_id_from_token(token: str) -> int:
+    """Проверка подписи JWT и извлечение ID; проверенный токен кэшируется."""
+    payload = decode_access_token(token)
     if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -52,12 +71,5 @@ async def get_current_admin(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    admin = AdminRepository.get_by_id(db, admin_id)
-    if admin is None or not admin.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Администратор не найден или неактивен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    return admin
+    cache.put_token_admin_id(token, admin_id, payload.get("exp"))
+    return admin_id
@@ -1,81 +1,121 @@
 """Репозиторий администраторов (CRUD)."""
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.auth import cache
 from backend.auth.model import Admin
-from backend.auth.utils import get_password_hash, verify_password
+from backend.auth.utils import (
+    PasswordHasherBusy,
+    get_password_hash_async,
+    password_needs_rehash,
+    verify_password_async,
+)
 
 
 class AdminRepository:
     """CRUD-операции для Admin."""
 
     @staticmethod
-    def create(db: Session, login: str, email: str, password: str) -> Admin:
+    async def create(db: AsyncSession, login: str, email: str, password: str) -> Admin:
         """Создание нового администратора."""
-        password_hash = get_password_hash(password)
+        password_hash = await get_password_hash_async(password)
         admin = Admin(login=login, email=email, password_hash=password_hash)
         db.add(admin)
-        db.commit()
-        db.refresh(admin)
+        await db.commit()
+        await db.refresh(admin)
+        cache.invalidate_admin_count()
         return admin
 
     @staticmethod
-    def get_by_email(db: Session, email: str) -> Admin | None:
+    async def get_by_email(db: AsyncSession, email: str) -> Admin | None:
         """Получение администратора по email."""
-        return db.query(Admin).filter(Admin.email == email).first()
+        return await db.scalar(select(Admin).where(Admin.email == email))
 
     @staticmethod
-    def get_by_id(db: Session, admin_id: int) -> Admin | None:
+    async def get_by_id(db: AsyncSession, admin_id: int) -> Admin | None:
         """Получение администратора по ID."""
-        return db.query(Admin).filter(Admin.id == admin_id).first()
+        return await db.scalar(select(Admin).where(Admin.id == admin_id))
 
     @staticmethod
-    def get_by_login(db: Session, login: str) -> Admin | None:
+    async def get_active_cached(db: AsyncSession, admin_id: int) -> Admin | None:
+        """Активный администратор по ID с кэшированием (для get_current_admin)."""
+        admin = cache.get_admin(admin_id)
+        if admin is None:
+            admin = await AdminRepository.get_by_id(db, admin_id)
+            if admin is None:
+                return None
+            cache.put_admin(admin)
+        return admin if admin.is_active else None
+
+    @staticmethod
+    async def get_by_login(db: AsyncSession, login: str) -> Admin | None:
         """Получение администратора по логину."""
-        return db.query(Admin).filter(Admin.login == login).first()
+        return await db.scalar(select(Admin).where(Admin.login == login))
 
     @staticmethod
-    def authenticate(db: Session, login: str, password: str) -> Admin | None:
+    async def authenticate(db: AsyncSession, login: str, password: str) -> Admin | None:
         """Аутентификация администратора."""
-        admin = AdminRepository.get_by_login(db, login)
+        admin = await AdminRepository.get_by_login(db, login)
         if not admin:
             return None
         if not admin.is_active:
             return None
-        if not verify_password(password, admin.password_hash):
+        if not await verify_password_async(password, admin.password_hash):
             return None
+        if password_needs_rehash(admin.password_hash):
+            # Стоимость bcrypt изменили — переводим хеш на новую при входе;
+            # при перегрузке пула вход не блокируем, перехешируем в следующий раз
+            try:
+                admin.password_hash = await get_password_hash_async(password)
+            except PasswordHasherBusy:
+                return admin
+            await db.commit()
+            cache.invalidate_admin(admin.id)
         return admin
 
     @staticmethod
-    def count(db: Session) -> int:
+    async def count(db: AsyncSession) -> int:
         """Подсчет количества администраторов."""
-        return db.query(Admin).count()
+        return await db.scalar(select(func.count()).select_from(Admin))
+
+    @staticmethod
+    async def count_cached(db: AsyncSession) -> int:
+        """Количество администраторов с кэшированием (для публичной проверки)."""
+        count = cache.get_admin_count()
+        if count is None:
+            count = await AdminRepository.count(db)
+            cache.put_admin_count(count)
+        return count
 
     @staticmethod
-    def get_all(db: Session, skip: int = 0, limit: int = 100) -> list[Admin]:
+    async def get_all(db: AsyncSession, skip: int = 0, limit: int = 100) -> list[Admin]:
         """Получение всех администраторов."""
-        return db.query(Admin).offset(skip).limit(limit).all()
+        result = await db.scalars(select(Admin).offset(skip).limit(limit))
+        return list(result)
 
     @staticmethod
-    def update(db: Session, admin_id: int, **kwargs) -> Admin | None:
+    async def update(db: AsyncSession, admin_id: int, **kwargs) -> Admin | None:
         """Обновление администратора."""
-        admin = AdminRepository.get_by_id(db, admin_id)
+        admin = await AdminRepository.get_by_id(db, admin_id)
         if not admin:
             return None
         if "password" in kwargs:
-            kwargs["password_hash"] = get_password_hash(kwargs.pop("password"))
+            kwargs["password_hash"] = await get_password_hash_async(kwargs.pop("password"))
         for key, value in kwargs.items():
             if hasattr(admin, key):
                 setattr(admin, key, value)
-        db.commit()
-        db.refresh(admin)
+        await db.commit()
+        await db.refresh(admin)
+        cache.invalidate_admin(admin_id)
         return admin
 
     @staticmethod
-    def delete(db: Session, admin_id: int) -> bool:
+    async def delete(db: AsyncSession, admin_id: int) -> bool:
         """Удаление администратора."""
-        admin = AdminRepository.get_by_id(db, admin_id)
+        admin = await AdminRepository.get_by_id(db, admin_id)
         if not admin:
             return False
-        db.delete(admin)
-        db.commit()
+        await db.delete(admin)
+        await db.commit()
+        cache.invalidate_admin(admin_id)
         return True
@@ -1,6 +1,6 @@
 """API-роуты для авторизации администраторов."""
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.auth.dependencies import get_current_admin
 from backend.auth.model import Admin
@@ -12,16 +12,19 @@ from backend.auth.schema import (
     AdminResponse,
     TokenResponse,
 )
-from backend.auth.utils import create_access_token
+from backend.auth.utils import PasswordHasherBusy, create_access_token
 from backend.core.database import get_db
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(credentials: AdminLogin, db: Session = Depends(get_db)):
+async def login(credentials: AdminLogin, db: AsyncSession = Depends(get_db)):
     """Вход администратора."""
-    admin = AdminRepository.authenticate(db, credentials.login, credentials.password)
+    try:
+        admin = await AdminRepository.authenticate(db, credentials.login, credentials.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
     if not admin:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -32,10 +35,10 @@ def login(credentials: AdminLogin, db: Session = Depends(get_db)):
 
 
 @router.post("/register", response_model=AdminResponse)
-def register(data: AdminRegister, db: Session = Depends(get_db)):
+async def register(data: AdminRegister, db: AsyncSession = Depends(get_db)):
     """Регистрация нового администратора (только если нет других админов)."""
     # Проверяем, есть ли уже администраторы
-    admin_count = AdminRepository.count(db)
+    admin_count = await AdminRepository.count(db)
     if admin_count > 0:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -43,7 +46,7 @@ def register(data: AdminRegister, db: Session = Depends(get_db)):
         )
     
     # Проверяем, не существует ли уже такой логин
-    existing_admin = AdminRepository.get_by_login(db, data.login)
+    existing_admin = await AdminRepository.get_by_login(db, data.login)
     if existing_admin:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -51,14 +54,17 @@ def register(data: AdminRegister, db: Session = Depends(get_db)):
         )
     
     # Проверяем, не существует ли уже такой email
-    existing_email = AdminRepository.get_by_email(db, data.email)
+    existing_email = await AdminRepository.get_by_email(db, data.email)
     if existing_email:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Администратор с таким email уже существует",
         )
     
-    admin = AdminRepository.create(db, data.login, data.email, data.password)
+    try:
+        admin = await AdminRepository.create(db, data.login, data.email, data.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
     return AdminResponse(
         id=admin.id,
         login=admin.login,
@@ -68,15 +74,23 @@ def register(data: AdminRegister, db: Session = Depends(get_db)):
     )
 
 
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Сервис авторизации перегружен, повторите попытку позже",
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.get("/check-admin-exists", response_model=AdminExistsResponse)
-def check_admin_exists(db: Session = Depends(get_db)):
+async def check_admin_exists(db: AsyncSession = Depends(get_db)):
     """Проверка наличия администраторов в системе."""
-    count = AdminRepository.count(db)
+    count = await AdminRepository.count_cached(db)
     return AdminExistsResponse(exists=count > 0, count=count)
 
 
 @router.get("/me", response_model=AdminResponse)
-def get_current_admin_info(admin: Admin = Depends(get_current_admin)):
+async def get_current_admin_info(admin: Admin = Depends(get_current_admin)):
     """Получение информации о текущем администраторе."""
     return AdminResponse(
         id=admin.id,
@@ -1,11 +1,16 @@
 """Утилиты для JWT-токенов и хеширования паролей."""
+import asyncio
 import logging
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 import bcrypt
 from jose import JWTError, jwt
 
+from backend.core.config import get_settings
+
 logger = logging.getLogger(__name__)
 
 # JWT-настройки
@@ -16,6 +21,21 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 часа
 # Ограничение bcrypt на длину пароля
 _BCRYPT_MAX_BYTES = 72
 
+_settings = get_settings()
+
+# Отдельный пул для bcrypt: вход и регистрация не занимают потоки,
+# которые обслуживают заявки и трекер. Сверх PASSWORD_HASH_QUEUE ожидающих
+# операций запрос сразу получает отказ (PasswordHasherBusy → 503).
+_hash_executor = ThreadPoolExecutor(
+    max_workers=_settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+)
+_hash_in_flight = 0
+_hash_in_flight_lock = threading.Lock()
+
+
+class PasswordHasherBusy(Exception):
+    """Пул хеширования паролей переполнен."""
+
 
 def _truncate_password(password: str) -> bytes:
     """Обрезка пароля до максимальной длины bcrypt (72 байта)."""
@@ -36,11 +56,55 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     """Хеширование пароля с помощью bcrypt."""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=_settings.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(_truncate_password(password), salt)
     return hashed.decode("utf-8")
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Хеш создан с другой стоимостью, чем BCRYPT_ROUNDS."""
+    # Формат: $2b$<rounds>$<salt+hash>
+    parts = hashed_password.split("$")
+    return len(parts) < 4 or parts[2] != f"{_settings.BCRYPT_ROUNDS:02d}"
+
+
+def _release_hash_slot(_future: Future) -> None:
+    global _hash_in_flight
+    with _hash_in_flight_lock:
+        _hash_in_flight -= 1
+
+
+async def _run_password_task(func, *args):
+    """Выполнить bcrypt-операцию в отдельном пуле с ограничением очереди.
+
+    Место в очереди освобождается, когда операция в пуле завершилась (или
+    была снята до начала), а не когда перестал ждать запрос: отменённый
+    запрос не должен открывать место, пока его bcrypt ещё занимает поток.
+    """
+    global _hash_in_flight
+    with _hash_in_flight_lock:
+        if _hash_in_flight >= _settings.PASSWORD_HASH_WORKERS + _settings.PASSWORD_HASH_QUEUE:
+            raise PasswordHasherBusy()
+        _hash_in_flight += 1
+    try:
+        future = _hash_executor.submit(func, *args)
+    except BaseException:
+        _release_hash_slot(None)
+        raise
+    future.add_done_callback(_release_hash_slot)
+    return await asyncio.wrap_future(future)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password в пуле bcrypt. PasswordHasherBusy при переполнении."""
+    return await _run_password_task(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash в пуле bcrypt. PasswordHasherBusy при переполнении."""
+    return await _run_password_task(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     """Создание JWT-токена."""
     to_encode = data.copy()
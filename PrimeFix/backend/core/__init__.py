@@ -1,4 +1,11 @@
 """Ядро приложения: конфигурация и подключение к БД."""
-from backend.core.database import Base, SessionLocal, engine, get_db
+from backend.core.database import (
+    AsyncSessionLocal,
+    Base,
+    SessionLocal,
+    async_engine,
+    engine,
+    get_db,
+)
 
-__all__ = ["Base", "SessionLocal", "engine", "get_db"]
+__all__ = ["AsyncSessionLocal", "Base", "SessionLocal", "async_engine", "engine", "get_db"]
@@ -9,7 +9,7 @@ from functools import lru_cache
 
 @dataclass(frozen=True)
 class Settings:
-    """Параметры подключения к PostgreSQL."""
+    """Параметры подключения к PostgreSQL и фоновых задач."""
 
     DB_HOST: str
     DB_PORT: int
@@ -17,6 +17,47 @@ class Settings:
     DB_USER: str
     DB_PASSWORD: str
 
+    # Пул соединений (на процесс; отдельно для async- и sync-движка)
+    DB_POOL_SIZE: int
+    DB_MAX_OVERFLOW: int
+    DB_POOL_TIMEOUT: float
+    DB_POOL_RECYCLE: int
+    # statement_timeout запросов API, мс (0 — без ограничения)
+    DB_STATEMENT_TIMEOUT_MS: int
+
+    # Отложенная запись пакетов трекера (lead_metrics)
+    METRICS_WRITE_BEHIND: bool
+    METRICS_FLUSH_INTERVAL: float
+    METRICS_FLUSH_MAX_PENDING: int
+    # Период пересчёта почасовых/суточных итогов метрик, секунд
+    METRICS_ROLLUP_INTERVAL: float
+    # Секции lead_metrics: месяцев вперёд и сколько месяцев хранить (0 — все)
+    METRICS_PARTITIONS_AHEAD: int
+    METRICS_PARTITIONS_KEEP_MONTHS: int
+    # Хранение старых сессий: полные траектории N дней, затем каждая STEP-я
+    # точка; сессии без заявки удаляются через N дней (0 — шаг отключён)
+    METRICS_TRAIL_FULL_DAYS: int
+    METRICS_TRAIL_DOWNSAMPLE_STEP: int
+    METRICS_UNLINKED_RETENTION_DAYS: int
+    METRICS_RETENTION_BATCH: int
+    METRICS_RETENTION_INTERVAL: float
+
+    # Кэш сводки лидов для дашборда (GET /leads/facets), секунд (0 — без кэша)
+    LEADS_FACETS_CACHE_TTL: float
+
+    # Кэш авторизации (auth/cache.py): время жизни записей, секунд
+    # (0 — без кэша), и максимум записей в каждом кэше
+    AUTH_CACHE_TTL: float
+    AUTH_CACHE_SIZE: int
+    # Пароли (auth/utils.py): стоимость bcrypt для новых хешей, потоки
+    # отдельного пула и предел ожидающих операций сверх них (дальше — 503)
+    BCRYPT_ROUNDS: int
+    PASSWORD_HASH_WORKERS: int
+    PASSWORD_HASH_QUEUE: int
+
+    # Кэш публичного списка услуг и max-age ответа, секунд
+    SERVICES_CACHE_TTL: int
+
 
 @lru_cache
 def get_settings() -> Settings:
@@ -27,12 +68,47 @@ def get_settings() -> Settings:
         DB_NAME=os.environ.get("DB_NAME", "app_db"),
         DB_USER=os.environ.get("DB_USER", "app_user"),
         DB_PASSWORD=os.environ.get("DB_PASSWORD", "change_me"),
+        DB_POOL_SIZE=int(os.environ.get("DB_POOL_SIZE", "10")),
+        DB_MAX_OVERFLOW=int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+        DB_POOL_TIMEOUT=float(os.environ.get("DB_POOL_TIMEOUT", "5")),
+        DB_POOL_RECYCLE=int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+        DB_STATEMENT_TIMEOUT_MS=int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "8000")),
+        METRICS_WRITE_BEHIND=_env_flag("METRICS_WRITE_BEHIND", True),
+        METRICS_FLUSH_INTERVAL=float(os.environ.get("METRICS_FLUSH_INTERVAL", "1.0")),
+        METRICS_FLUSH_MAX_PENDING=int(os.environ.get("METRICS_FLUSH_MAX_PENDING", "500")),
+        METRICS_ROLLUP_INTERVAL=float(os.environ.get("METRICS_ROLLUP_INTERVAL", "60")),
+        METRICS_PARTITIONS_AHEAD=int(os.environ.get("METRICS_PARTITIONS_AHEAD", "3")),
+        METRICS_PARTITIONS_KEEP_MONTHS=int(os.environ.get("METRICS_PARTITIONS_KEEP_MONTHS", "0")),
+        METRICS_TRAIL_FULL_DAYS=int(os.environ.get("METRICS_TRAIL_FULL_DAYS", "30")),
+        METRICS_TRAIL_DOWNSAMPLE_STEP=int(os.environ.get("METRICS_TRAIL_DOWNSAMPLE_STEP", "10")),
+        METRICS_UNLINKED_RETENTION_DAYS=int(os.environ.get("METRICS_UNLINKED_RETENTION_DAYS", "180")),
+        METRICS_RETENTION_BATCH=int(os.environ.get("METRICS_RETENTION_BATCH", "500")),
+        METRICS_RETENTION_INTERVAL=float(os.environ.get("METRICS_RETENTION_INTERVAL", "3600")),
+        LEADS_FACETS_CACHE_TTL=float(os.environ.get("LEADS_FACETS_CACHE_TTL", "30")),
+        AUTH_CACHE_TTL=float(os.environ.get("AUTH_CACHE_TTL", "60")),
+        AUTH_CACHE_SIZE=int(os.environ.get("AUTH_CACHE_SIZE", "1024")),
+        BCRYPT_ROUNDS=int(os.environ.get("BCRYPT_ROUNDS", "12")),
+        PASSWORD_HASH_WORKERS=int(os.environ.get("PASSWORD_HASH_WORKERS", "2")),
+        PASSWORD_HASH_QUEUE=int(os.environ.get("PASSWORD_HASH_QUEUE", "16")),
+        SERVICES_CACHE_TTL=int(os.environ.get("SERVICES_CACHE_TTL", "60")),
     )
 
 
-def get_database_url() -> str:
-    """Формирование URL подключения к PostgreSQL."""
+def _env_flag(name: str, default: bool) -> bool:
+    """Булев флаг из переменной окружения (1/true/yes)."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes")
+
+
+def get_database_url(driver: str = "postgresql") -> str:
+    """Формирование URL подключения к PostgreSQL.
+
+    driver — схема SQLAlchemy: "postgresql" (psycopg2, синхронный движок)
+    или "postgresql+asyncpg" (асинхронный движок API).
+    """
     s = get_settings()
     return (
-        f"postgresql://{s.DB_USER}:{s.DB_PASSWORD}@{s.DB_HOST}:{s.DB_PORT}/{s.DB_NAME}"
+        f"{driver}://{s.DB_USER}:{s.DB_PASSWORD}@{s.DB_HOST}:{s.DB_PORT}/{s.DB_NAME}"
     )
@@ -1,25 +1,64 @@
 """
 Драйвер подключения к PostgreSQL.
 Доступ к БД только через backend; параметры из docker-compose (сервис postgres).
+
+API работает через асинхронный движок (asyncpg): get_db отдаёт AsyncSession,
+и ожидание PostgreSQL не занимает поток пула Starlette.
+Синхронный движок (psycopg2) остаётся для миграций при старте, CLI-задач
+и CPU-тяжёлых агрегаций, которые выполняются в отдельном потоке.
+
+Размер пула, таймауты и statement_timeout задаются в Settings (DB_POOL_*).
+statement_timeout ставится только для API: миграции и CLI работают дольше
+таймаута Nginx.
 """
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from backend.core.config import get_database_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from backend.core.config import get_database_url, get_settings
+from backend.core.pool import timed_pool_class
+
+_settings = get_settings()
+_pool_options = dict(
+    pool_size=_settings.DB_POOL_SIZE,
+    max_overflow=_settings.DB_MAX_OVERFLOW,
+    pool_timeout=_settings.DB_POOL_TIMEOUT,
+    pool_recycle=_settings.DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
 
 Base = declarative_base()
 engine = create_engine(
     get_database_url(),
-    pool_pre_ping=True,
+    poolclass=timed_pool_class(QueuePool),
     echo=False,
+    **_pool_options,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_api_server_settings = {}
+if _settings.DB_STATEMENT_TIMEOUT_MS > 0:
+    _api_server_settings["statement_timeout"] = str(_settings.DB_STATEMENT_TIMEOUT_MS)
+
+async_engine = create_async_engine(
+    get_database_url("postgresql+asyncpg"),
+    poolclass=timed_pool_class(AsyncAdaptedQueuePool),
+    connect_args={"server_settings": _api_server_settings},
+    echo=False,
+    **_pool_options,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 
-def get_db():
-    """Генератор сессии БД для FastAPI Depends."""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """Генератор асинхронной сессии БД для FastAPI Depends."""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
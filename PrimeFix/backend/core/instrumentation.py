@@ -0,0 +1,281 @@
+"""Метрики API в формате Prometheus (text exposition 0.0.4).
+
+Счётчики и гистограммы живут в памяти процесса (backend — один процесс
+uvicorn), без prometheus_client и внешних сервисов. Prometheus забирает их
+с GET /api/metrics — снаружи адрес закрыт в Nginx, доступен из сети Docker
+(backend:8080).
+
+* HTTP — InstrumentationMiddleware: число запросов по методу, шаблону
+  маршрута и коду ответа, гистограмма длительности, запросы в работе;
+* пулы БД — снимаются при каждом чтении /api/metrics (core/pool.py);
+* трекер и скоринг — счётчики, которые увеличивают lead_metrics и leads.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections.abc import Callable, Iterator
+
+from sqlalchemy.engine import Engine
+
+from backend.core.pool import pool_status
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы гистограммы длительности запросов, секунд (выгрузка — до минуты)
+_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Метка route для запросов, не совпавших ни с одним маршрутом (404, сканеры)
+_UNMATCHED_ROUTE = "unmatched"
+
+_REGISTRY: list[_Metric] = []
+_COLLECT_HOOKS: list[Callable[[], None]] = []
+
+
+# ── Типы метрик ──────────────────────────────────────────────────────
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _add(self, amount: float, labels: dict[str, str]) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, value: float, **labels: str) -> None:
+        """Записать значение целиком (для величин, которые ведёт не этот модуль)."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> Iterator[tuple[str, tuple[tuple[str, str], ...], float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        self._add(amount, labels)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        self._add(amount, labels)
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self._add(-amount, labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = _DURATION_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # ключ меток → [счётчики по корзинам (не накопительно), сумма, число]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> Iterator[tuple[str, tuple[tuple[str, str], ...], float]]:
+        with self._lock:
+            series = [(key, list(counts), total, n) for key, (counts, total, n) in self._series.items()]
+        for key, counts, total, n in series:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + (("le", _format_value(bound)),), cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, n
+
+
+# ── Метрики приложения ───────────────────────────────────────────────
+
+HTTP_REQUESTS = Counter(
+    "primefix_http_requests_total", "HTTP requests by method, route and status code",
+    ("method", "route", "status"),
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "primefix_http_request_duration_seconds", "HTTP request latency until the response is sent",
+    ("method", "route"),
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "primefix_http_requests_in_progress", "HTTP requests being handled now",
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "primefix_db_pool_connections", "Pool connections by state", ("pool", "state"),
+)
+DB_POOL_SIZE = Gauge("primefix_db_pool_size", "Configured pool size", ("pool",))
+DB_POOL_CHECKOUTS = Counter(
+    "primefix_db_pool_checkouts_total", "Connections handed out by the pool", ("pool",),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "primefix_db_pool_timeouts_total", "Checkouts that failed with a pool timeout", ("pool",),
+)
+DB_POOL_WAIT = Counter(
+    "primefix_db_pool_wait_seconds_total", "Time spent waiting for a pool connection", ("pool",),
+)
+
+TRACKER_SESSIONS = Counter(
+    "primefix_tracker_sessions_created_total", "Tracker sessions created (lead_metrics rows)",
+)
+TRACKER_DELTAS = Counter(
+    "primefix_tracker_deltas_total",
+    "Tracker append deltas received; applied=false is a repeated seq or unknown session",
+    ("applied",),
+)
+TRACKER_BUFFER_PENDING = Gauge(
+    "primefix_tracker_buffer_pending", "Sessions waiting in the write-behind buffer",
+)
+TRACKER_BUFFER_FLUSHED = Counter(
+    "primefix_tracker_buffer_flushed_total", "Sessions written by write-behind buffer flushes",
+)
+
+LEADS_SCORED = Counter("primefix_leads_scored_total", "Leads scored")
+LEAD_SCORING_SECONDS = Counter(
+    "primefix_lead_scoring_seconds_total", "Time spent scoring leads",
+)
+
+
+# ── Сбор и вывод ─────────────────────────────────────────────────────
+
+def on_collect(hook: Callable[[], None]) -> None:
+    """Функция, обновляющая метрики перед каждой выдачей /api/metrics."""
+    _COLLECT_HOOKS.append(hook)
+
+
+def instrument_pools(**engines: Engine) -> None:
+    """Метрики пулов соединений; имя аргумента — значение метки pool."""
+
+    def collect() -> None:
+        for name, engine in engines.items():
+            status = pool_status(engine.pool)
+            DB_POOL_SIZE.set(status["pool_size"], pool=name)
+            for state in ("checked_out", "idle", "overflow"):
+                DB_POOL_CONNECTIONS.set(status[state], pool=name, state=state)
+            if "checkouts" in status:
+                DB_POOL_CHECKOUTS.set(status["checkouts"], pool=name)
+                DB_POOL_TIMEOUTS.set(status["timeouts"], pool=name)
+                DB_POOL_WAIT.set(status["wait_total_ms"] / 1000, pool=name)
+
+    on_collect(collect)
+
+
+def render_metrics() -> str:
+    """Все метрики процесса в текстовом формате Prometheus."""
+    for hook in _COLLECT_HOOKS:
+        hook()
+    lines: list[str] = []
+    for metric in _REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in metric.samples():
+            if labels:
+                rendered = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                name = f"{name}{{{rendered}}}"
+            lines.append(f"{name} {_format_value(value)}")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# ── HTTP ─────────────────────────────────────────────────────────────
+
+class InstrumentationMiddleware:
+    """ASGI-middleware: счётчик, длительность и код ответа каждого запроса.
+
+    Метка route — шаблон маршрута (/api/leads/{lead_id}), а не путь, чтобы
+    число рядов не росло с числом id. Длительность — до последнего байта
+    ответа (для потоковой выгрузки — вся передача).
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = _route_label(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status))
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, method=method, route=route)
+
+
+def _route_label(scope) -> str:
+    """Шаблон маршрута запроса (/api/leads/{lead_id}) или unmatched."""
+    route = scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if template is None:
+        return _UNMATCHED_ROUTE
+    # Маршрут подключённого роутера может хранить путь без prefix из
+    # include_router: префикс — часть пути запроса перед совпавшим хвостом
+    try:
+        tail = template.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return template
+    path = scope["path"]
+    if path.endswith(tail):
+        return path[: len(path) - len(tail)] + template
+    return template
@@ -0,0 +1,59 @@
+"""Keyset-пагинация: непрозрачные курсоры для списков.
+
+Курсор — base64url от JSON со значениями ключа сортировки последней
+строки страницы (например {"id": 1234}). Следующая страница выбирается
+условием по этим значениям (WHERE id < :id), а не OFFSET, поэтому
+глубокие страницы стоят столько же, сколько первая.
+
+Тело ответа списков не меняется (массив); курсор следующей страницы
+отдаётся в заголовке X-Next-Cursor и передаётся обратно в ?cursor=.
+"""
+import base64
+import json
+import math
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(**values) -> str:
+    """Курсор из значений ключа сортировки."""
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(
+    cursor: str | None, *keys: str, float_keys: tuple[str, ...] = ()
+) -> tuple | None:
+    """Значения ключей из курсора; 400, если курсор повреждён или чужой.
+
+    Ключи целочисленные, кроме перечисленных в float_keys (например, ранг поиска).
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = tuple(data[key] for key in keys)
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not all(
+        _valid_value(v, key in float_keys) for key, v in zip(keys, values)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _valid_value(value, allow_float: bool) -> bool:
+    if isinstance(value, bool):
+        return False
+    if allow_float and isinstance(value, float):
+        return math.isfinite(value)
+    return isinstance(value, int)
+
+
+def set_next_cursor(response: Response, items: list, limit: int, **values) -> None:
+    """Заголовок X-Next-Cursor, если страница заполнена целиком."""
+    if len(items) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(**values)
@@ -0,0 +1,88 @@
+"""Пул соединений с учётом времени ожидания.
+
+QueuePool не хранит статистику ожидания: сколько запросов ждали свободное
+соединение, сколько ждали и сколько не дождались (TimeoutError). Пулы
+движков создаются через timed_pool_class — подкласс, замеряющий время
+получения соединения из пула. Класс создаётся на каждый движок, поэтому
+статистика переживает engine.dispose() (пул пересоздаётся тем же классом).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+@dataclass
+class PoolWaitStats:
+    """Накопленная статистика получения соединений из пула."""
+
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            if seconds > self.wait_max:
+                self.wait_max = seconds
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg = self.wait_total / self.checkouts if self.checkouts else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(avg * 1000, 3),
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "wait_total_ms": round(self.wait_total * 1000, 3),
+            }
+
+
+def timed_pool_class(base: type[QueuePool]) -> type[QueuePool]:
+    """Подкласс пула base с собственным PoolWaitStats (атрибут wait_stats)."""
+
+    class TimedPool(base):
+        wait_stats = PoolWaitStats()
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except exc.TimeoutError:
+                self.wait_stats.record_timeout()
+                raise
+            self.wait_stats.record(time.perf_counter() - started)
+            return conn
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+def pool_status(pool: QueuePool) -> dict:
+    """Текущее состояние пула и статистика ожидания."""
+    overflow = pool.overflow()
+    status = {
+        "pool_size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "timeout_s": pool.timeout(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        # QueuePool считает overflow от -pool_size: отрицательное значение —
+        # ещё не открытые соединения основного пула
+        "overflow": max(overflow, 0),
+    }
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        status.update(wait_stats.snapshot())
+    return status
@@ -0,0 +1,37 @@
+"""Ответы списочных эндпоинтов (до 1000 строк).
+
+Обычный путь FastAPI проверяет возвращённые объекты схемой response_model
+и затем кодирует их заново. Здесь строки из БД проверяются схемой ответа
+один раз (TypeAdapter, from_attributes) и сразу кодируются в JSON тем же
+TypeAdapter (dump_json — один проход в pydantic-core); маршрут
+возвращает готовый Response, и FastAPI его уже не трогает. response_model
+у маршрута оставляем — он нужен для документации OpenAPI.
+
+Заголовки, выставленные на параметре response: Response маршрута, к
+готовому Response не добавляются — X-Next-Cursor ставится на него самого.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import Any
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+class ListSerializer:
+    """Список ORM-объектов → JSON по схеме ответа."""
+
+    def __init__(self, schema: type[BaseModel]) -> None:
+        self._adapter = TypeAdapter(list[schema])
+
+    def dump(self, rows: Iterable[Any]) -> bytes:
+        items = self._adapter.validate_python(list(rows), from_attributes=True)
+        return self._adapter.dump_json(items)
+
+    def response(
+        self, rows: Iterable[Any], headers: dict[str, str] | None = None
+    ) -> Response:
+        return Response(self.dump(rows), media_type=JSON_MEDIA_TYPE, headers=headers)
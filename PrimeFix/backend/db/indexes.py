@@ -0,0 +1,152 @@
+"""Управляемый набор вторичных индексов.
+
+Индексы под реальные пути доступа роутеров и админки строятся через
+CREATE INDEX CONCURRENTLY: построение на большой таблице не блокирует
+вставки из формы заявки и трекера. Такой индекс нельзя строить внутри
+транзакции, поэтому набор применяется отдельно от run_migrations —
+в фоновом потоке при старте приложения или вручную:
+
+    python -m backend.db.indexes
+
+Повторный запуск безопасен: существующие валидные индексы пропускаются,
+невалидные (прерванное построение) пересоздаются. Из нескольких воркеров
+индексы строит один — под advisory lock.
+
+Для секционированной таблицы CONCURRENTLY недоступен: её индексы объявлены
+в модели и наследуются секциями, а набор такие таблицы пропускает. Пока
+lead_metrics не секционирована (таблица с данными ждёт команды
+partitions --convert), её индексы строятся здесь, как и остальные.
+"""
+from __future__ import annotations
+
+import logging
+import sys
+import threading
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_lock для построения индексов
+_LOCK_KEY = 7_310_012
+
+
+@dataclass(frozen=True)
+class ManagedIndex:
+    """Индекс: имя, таблица и определение после имени таблицы."""
+
+    name: str
+    table: str
+    definition: str
+
+    @property
+    def create_sql(self) -> str:
+        return (
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} "
+            f"ON {self.table} {self.definition}"
+        )
+
+    @property
+    def create_blocking_sql(self) -> str:
+        """CREATE INDEX без CONCURRENTLY — для секционированной таблицы в миграции."""
+        return f"CREATE INDEX IF NOT EXISTS {self.name} ON {self.table} {self.definition}"
+
+
+MANAGED_INDEXES: tuple[ManagedIndex, ...] = (
+    # /leads/scored/: ORDER BY score DESC, id DESC и keyset-курсор
+    ManagedIndex("ix_leads_score_id", "leads", "(score, id)"),
+    # Фильтр по температуре с сортировкой по баллу
+    ManagedIndex("ix_leads_temperature_score_id", "leads", "(temperature, score, id)"),
+    # Выборки и отчёты по периоду создания заявки
+    ManagedIndex("ix_leads_created_at", "leads", "(created_at)"),
+    # Фильтр и группировка по услуге
+    ManagedIndex("ix_leads_service", "leads", "(service)"),
+    # GET /leads/search: search_vector @@ запрос
+    ManagedIndex("ix_leads_search_vector", "leads", "USING gin (search_vector)"),
+    # lead_metrics: пока таблица не секционирована, её индексы строятся здесь;
+    # у секционированной они объявлены в модели и наследуются секциями.
+    # Диапазоны по created_at: хитмэп, пересчёт итогов, хранение
+    ManagedIndex("ix_lead_metrics_created_at", "lead_metrics", "(created_at)"),
+    # Прореживание старых траекторий (retention.py)
+    ManagedIndex(
+        "ix_lead_metrics_full_trails", "lead_metrics",
+        "(created_at, id) WHERE cursor_pts_total IS NULL AND cursor_pts IS NOT NULL",
+    ),
+)
+
+
+def managed_index(name: str) -> ManagedIndex:
+    return next(index for index in MANAGED_INDEXES if index.name == name)
+
+
+def _is_partitioned(conn: Connection, table: str) -> bool:
+    return conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": table},
+    ).scalar() is True
+
+
+def _index_state(conn: Connection, name: str) -> bool | None:
+    """True — индекс валиден, False — построение прервано, None — индекса нет."""
+    return conn.execute(
+        text(
+            "SELECT i.indisvalid FROM pg_class c "
+            "JOIN pg_index i ON i.indexrelid = c.oid "
+            "WHERE c.relname = :name AND c.relkind = 'i'"
+        ),
+        {"name": name},
+    ).scalar()
+
+
+def ensure_indexes(engine: Engine) -> list[str]:
+    """Построить недостающие индексы набора. Возвращает имена построенных."""
+    built: list[str] = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": _LOCK_KEY}).scalar():
+            logger.info("Index build is running in another process, skipping")
+            return built
+        try:
+            for index in MANAGED_INDEXES:
+                if _is_partitioned(conn, index.table):
+                    continue
+                state = _index_state(conn, index.name)
+                if state:
+                    continue
+                if state is False:
+                    logger.warning("Index %s is invalid, rebuilding", index.name)
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}"))
+                logger.info("Building index %s", index.name)
+                conn.execute(text(index.create_sql))
+                built.append(index.name)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _LOCK_KEY})
+    return built
+
+
+def start_index_build(engine: Engine) -> threading.Thread:
+    """Построение индексов в фоновом потоке (не задерживает старт API)."""
+
+    def run() -> None:
+        try:
+            ensure_indexes(engine)
+        except Exception as e:
+            logger.warning("Index build error (non-fatal): %s", e)
+
+    thread = threading.Thread(target=run, name="db-index-build", daemon=True)
+    thread.start()
+    return thread
+
+
+def main() -> int:
+    from backend.core.database import engine
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    built = ensure_indexes(engine)
+    logger.info("Done, built: %s", ", ".join(built) or "nothing")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
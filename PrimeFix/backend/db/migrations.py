@@ -1,43 +1,194 @@
-"""Автоматические миграции при старте приложения."""
+"""Версионированные миграции схемы, применяемые при старте приложения.
+
+Шаги перечислены в MIGRATIONS по порядку: SQL-файлы из db/migrations/
+и функции Python. Применённые версии записываются в таблицу
+schema_migrations, каждый шаг выполняется в своей транзакции вместе
+с записью в журнал.
+
+Воркеры сначала без блокировок сверяют журнал со списком шагов и, если
+схема актуальна, сразу переходят к обслуживанию запросов. Иначе шаги
+применяются под pg_advisory_lock: один воркер мигрирует, остальные ждут
+и затем видят актуальный журнал. Ошибка шага останавливает старт —
+приложение не работает на полусобранной схеме.
+
+Новая таблица или колонка — новый шаг в конце MIGRATIONS (create_all
+выполняется только в базовом шаге).
+"""
+from __future__ import annotations
+
 import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
 
 from sqlalchemy import text
 from sqlalchemy.engine import Connection, Engine
 
 from backend.auth.model import Admin
-from backend.lead_metrics.model import LeadMetrics
+from backend.core.config import get_settings
+from backend.db.indexes import managed_index
+from backend.lead_metrics.model import LeadMetrics, LeadMetricsDaily, LeadMetricsHourly
+from backend.lead_metrics.partitions import (
+    convert_to_partitioned, ensure_partitions, is_partitioned,
+)
+from backend.lead_metrics.rollup import BACKFILL_DAILY_SQL, BACKFILL_HOURLY_SQL
+from backend.lead_metrics.trail import encode_points, parse_trail_json
+from backend.leads.model import SEARCH_VECTOR_SQL
+from backend.leads.scoring import score_leads
 from backend.core.database import Base
+import backend.leads.model  # noqa: F401  (регистрация таблиц для create_all)
+import backend.services.model  # noqa: F401
 
 logger = logging.getLogger(__name__)
 
+_SQL_DIR = Path(__file__).resolve().parent / "migrations"
 
-def run_migrations(engine: Engine) -> None:
-    """Применение миграций к базе данных.
+# Ключ pg_advisory_lock для применения миграций
+_LOCK_KEY = 7_310_013
 
-    Выполняется при каждом запуске приложения; каждая миграция
-    идемпотентна (IF NOT EXISTS / проверка перед изменением).
-    """
-    try:
-        with engine.begin() as conn:
-            _migrate_leads_table(conn)
-            _migrate_admins_table(conn, engine)
-            _migrate_lead_metrics_table(conn, engine)
-            _drop_behavior_metrics_table(conn)
-    except Exception as e:
-        logger.warning("Migration error (non-fatal): %s", e)
 
+@dataclass(frozen=True)
+class Migration:
+    """Шаг миграции: версия (порядок), имя и применяющая функция."""
 
-# ── Внутренние функции миграций ──────────────────────────────────────
+    version: str
+    name: str
+    apply: Callable[[Connection], None]
 
 
-def _migrate_leads_table(conn: Connection) -> None:
-    """Добавление колонки service в таблицу leads."""
-    conn.execute(
-        text("ALTER TABLE leads ADD COLUMN IF NOT EXISTS service VARCHAR(255)")
-    )
+def _sql_file(filename: str) -> Callable[[Connection], None]:
+    """Шаг из SQL-файла db/migrations/<filename>."""
+
+    def apply(conn: Connection) -> None:
+        conn.exec_driver_sql((_SQL_DIR / filename).read_text(encoding="utf-8"))
+
+    apply.__name__ = filename
+    return apply
+
+
+def run_migrations(engine: Engine) -> list[str]:
+    """Применение недостающих миграций. Возвращает применённые версии."""
+    if not _pending(engine):
+        return []
+
+    applied: list[str] = []
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _LOCK_KEY})
+        try:
+            conn.commit()
+            _ensure_ledger(conn)
+            done = _applied_versions(conn)
+            for migration in MIGRATIONS:
+                if migration.version in done:
+                    continue
+                logger.info("Applying migration %s %s", migration.version, migration.name)
+                try:
+                    with conn.begin():
+                        migration.apply(conn)
+                        conn.execute(
+                            text(
+                                "INSERT INTO schema_migrations (version, name) "
+                                "VALUES (:version, :name)"
+                            ),
+                            {"version": migration.version, "name": migration.name},
+                        )
+                except Exception:
+                    logger.exception("Migration %s %s failed", migration.version, migration.name)
+                    raise
+                applied.append(migration.version)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _LOCK_KEY})
+            conn.commit()
+    return applied
+
+
+def _pending(engine: Engine) -> list[Migration]:
+    """Неприменённые шаги (чтение журнала без блокировок)."""
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT to_regclass('schema_migrations')")).scalar() is None:
+            return list(MIGRATIONS)
+        done = _applied_versions(conn)
+    return [m for m in MIGRATIONS if m.version not in done]
+
+
+def _ensure_ledger(conn: Connection) -> None:
+    with conn.begin():
+        conn.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "  version VARCHAR(32) PRIMARY KEY,"
+                "  name TEXT NOT NULL,"
+                "  applied_at TIMESTAMPTZ NOT NULL DEFAULT now()"
+                ")"
+            )
+        )
+
+
+def _applied_versions(conn: Connection) -> set[str]:
+    versions = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+    conn.rollback()
+    return versions
+
+
+# ── Шаги миграций ────────────────────────────────────────────────────
+
+
+def _create_schema(conn: Connection) -> None:
+    """Базовая схема: таблицы моделей, которых ещё нет."""
+    Base.metadata.create_all(bind=conn)
+
+
+def _add_lead_score_columns(conn: Connection) -> None:
+    """Колонки сохранённого скоринга (индекс — в db/indexes.py)."""
+    for ddl in (
+        "ADD COLUMN IF NOT EXISTS score INTEGER",
+        "ADD COLUMN IF NOT EXISTS temperature VARCHAR(20)",
+        "ADD COLUMN IF NOT EXISTS priority VARCHAR(20)",
+        "ADD COLUMN IF NOT EXISTS needs_personal_manager BOOLEAN",
+        "ADD COLUMN IF NOT EXISTS department VARCHAR(50)",
+        "ADD COLUMN IF NOT EXISTS summary TEXT",
+    ):
+        conn.execute(text(f"ALTER TABLE leads {ddl}"))
+
+
+_BACKFILL_BATCH = 500
 
 
-def _migrate_admins_table(conn: Connection, engine: Engine) -> None:
+def _backfill_lead_scores(conn: Connection) -> None:
+    """Скоринг лидов, сохранённых до появления колонок score (score IS NULL)."""
+    total = 0
+    while True:
+        rows = conn.execute(
+            text("SELECT * FROM leads WHERE score IS NULL ORDER BY id LIMIT :n"),
+            {"n": _BACKFILL_BATCH},
+        ).mappings().all()
+        if not rows:
+            break
+        params = []
+        for row, sc in zip(rows, score_leads(rows)):
+            params.append({
+                "id": row["id"],
+                "score": sc.score,
+                "temperature": sc.temperature,
+                "priority": sc.priority,
+                "needs_pm": sc.needs_personal_manager,
+                "department": sc.department,
+                "summary": sc.summary,
+            })
+        conn.execute(
+            text(
+                "UPDATE leads SET score = :score, temperature = :temperature, "
+                "priority = :priority, needs_personal_manager = :needs_pm, "
+                "department = :department, summary = :summary WHERE id = :id"
+            ),
+            params,
+        )
+        total += len(rows)
+    if total:
+        logger.info("Backfilled lead scores: %d rows", total)
+
+
+def _migrate_admins_table(conn: Connection) -> None:
     """Добавление колонки email в таблицу admins."""
     table_exists = conn.execute(
         text(
@@ -68,7 +219,7 @@ def _migrate_admins_table(conn: Connection, engine: Engine) -> None:
 
     if row_count == 0:
         conn.execute(text("DROP TABLE admins CASCADE"))
-        Base.metadata.create_all(bind=engine, tables=[Admin.__table__])
+        Base.metadata.create_all(bind=conn, tables=[Admin.__table__])
     else:
         conn.execute(text("ALTER TABLE admins ADD COLUMN email VARCHAR(255)"))
         _ensure_email_index(conn)
@@ -90,7 +241,7 @@ def _ensure_email_index(conn: Connection) -> None:
         pass
 
 
-def _migrate_lead_metrics_table(conn: Connection, engine: Engine) -> None:
+def _migrate_lead_metrics_table(conn: Connection) -> None:
     """Миграция lead_metrics: старая структура (id = FK leads) -> новая (auto PK + lead_id FK).
 
     Если таблица имеет старую структуру (нет колонки lead_id),
@@ -127,6 +278,152 @@ def _migrate_lead_metrics_table(conn: Connection, engine: Engine) -> None:
     LeadMetrics.__table__.create(conn)
 
 
+def _add_lead_metrics_seq_column(conn: Connection) -> None:
+    """Добавление колонки last_seq (протокол дозаписи трекера)."""
+    conn.execute(
+        text(
+            "ALTER TABLE lead_metrics "
+            "ADD COLUMN IF NOT EXISTS last_seq INTEGER NOT NULL DEFAULT 0"
+        )
+    )
+
+
 def _drop_behavior_metrics_table(conn: Connection) -> None:
     """Удаление устаревшей таблицы behavior_metrics, если она существует."""
     conn.execute(text("DROP TABLE IF EXISTS behavior_metrics CASCADE"))
+
+
+def _create_lead_metrics_rollups(conn: Connection) -> None:
+    """Таблицы почасовых/суточных итогов и их построение по всей истории."""
+    Base.metadata.create_all(
+        bind=conn, tables=[LeadMetricsHourly.__table__, LeadMetricsDaily.__table__]
+    )
+    conn.exec_driver_sql(BACKFILL_HOURLY_SQL)
+    conn.exec_driver_sql(BACKFILL_DAILY_SQL)
+
+
+
+_TRAIL_BATCH = 1000
+
+
+def _convert_cursor_trails(conn: Connection) -> None:
+    """Колонки бинарной траектории и перенос JSON-снимков в них.
+
+    Строки обходятся по id пачками; неразбираемый текст остаётся в
+    cursor_hover_data как есть.
+    """
+    for ddl in (
+        "ADD COLUMN IF NOT EXISTS cursor_w INTEGER",
+        "ADD COLUMN IF NOT EXISTS cursor_h INTEGER",
+        "ADD COLUMN IF NOT EXISTS cursor_pts BYTEA",
+    ):
+        conn.execute(text(f"ALTER TABLE lead_metrics {ddl}"))
+
+    last_id = converted = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, cursor_hover_data FROM lead_metrics "
+                "WHERE id > :last_id AND cursor_pts IS NULL "
+                "AND cursor_hover_data IS NOT NULL AND cursor_hover_data <> '' "
+                "ORDER BY id LIMIT :n"
+            ),
+            {"last_id": last_id, "n": _TRAIL_BATCH},
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        params = []
+        for row in rows:
+            trail = parse_trail_json(row.cursor_hover_data)
+            if trail is not None:
+                w, h, pts = trail
+                params.append({"id": row.id, "w": w, "h": h, "pts": encode_points(pts)})
+        if params:
+            conn.execute(
+                text(
+                    "UPDATE lead_metrics SET cursor_w = :w, cursor_h = :h, "
+                    "cursor_pts = :pts, cursor_hover_data = NULL WHERE id = :id"
+                ),
+                params,
+            )
+            converted += len(params)
+    if converted:
+        logger.info("Converted cursor trails to binary: %d rows", converted)
+
+
+
+def _partition_lead_metrics(conn: Connection) -> None:
+    """lead_metrics → таблица, секционированная по месяцам created_at.
+
+    Пустая таблица пересоздаётся сразу. Таблицу с данными при старте не
+    трогаем: копирование идёт под эксклюзивной блокировкой и останавливает
+    трекер, поэтому её секционирует отдельная команда
+    python -m backend.lead_metrics.partitions --convert.
+    """
+    months_ahead = get_settings().METRICS_PARTITIONS_AHEAD
+    if is_partitioned(conn):
+        ensure_partitions(conn, months_ahead)
+        return
+    if conn.execute(text("SELECT EXISTS (SELECT 1 FROM lead_metrics)")).scalar():
+        logger.warning(
+            "lead_metrics holds data and stays unpartitioned; run "
+            "python -m backend.lead_metrics.partitions --convert in a maintenance window"
+        )
+        return
+    convert_to_partitioned(conn, months_ahead)
+
+
+
+def _add_lead_metrics_trail_total_column(conn: Connection) -> None:
+    """Колонка cursor_pts_total (прореживание старых траекторий)."""
+    conn.execute(
+        text("ALTER TABLE lead_metrics ADD COLUMN IF NOT EXISTS cursor_pts_total INTEGER")
+    )
+
+
+def _add_lead_search_vector_column(conn: Connection) -> None:
+    """Вычисляемый tsvector для полнотекстового поиска (GIN — в db/indexes.py).
+
+    Добавление STORED-колонки переписывает таблицу leads под эксклюзивной
+    блокировкой — один раз, при обновлении.
+    """
+    conn.execute(
+        text(
+            "ALTER TABLE leads ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+        )
+    )
+
+
+def _add_lead_metrics_full_trails_index(conn: Connection) -> None:
+    """Частичный индекс выборки прореживания (retention.py).
+
+    Для секционированной lead_metrics CONCURRENTLY недоступен: индекс
+    строится здесь обычным CREATE INDEX (в условие попадают только
+    непрореженные сессии, поэтому он небольшой). Ещё не секционированную
+    таблицу с данными не трогаем — индекс построит CONCURRENTLY набор
+    db/indexes.py, не блокируя трекер.
+    """
+    if is_partitioned(conn):
+        conn.execute(text(managed_index("ix_lead_metrics_full_trails").create_blocking_sql))
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration("0001", "create_schema", _create_schema),
+    Migration("0002", "create_services_table", _sql_file("create_services_table.sql")),
+    Migration("0003", "admins_email_column", _migrate_admins_table),
+    Migration("0004", "create_admins_table", _sql_file("create_admins_table.sql")),
+    Migration("0005", "add_lead_service_column", _sql_file("add_lead_service_column.sql")),
+    Migration("0006", "lead_metrics_own_pk", _migrate_lead_metrics_table),
+    Migration("0007", "lead_score_columns", _add_lead_score_columns),
+    Migration("0008", "backfill_lead_scores", _backfill_lead_scores),
+    Migration("0009", "lead_metrics_last_seq", _add_lead_metrics_seq_column),
+    Migration("0010", "drop_behavior_metrics", _drop_behavior_metrics_table),
+    Migration("0011", "lead_metrics_rollups", _create_lead_metrics_rollups),
+    Migration("0012", "lead_metrics_binary_trails", _convert_cursor_trails),
+    Migration("0013", "lead_metrics_partitioning", _partition_lead_metrics),
+    Migration("0014", "lead_metrics_trail_total", _add_lead_metrics_trail_total_column),
+    Migration("0015", "lead_search_vector", _add_lead_search_vector_column),
+    Migration("0016", "lead_metrics_full_trails_index", _add_lead_metrics_full_trails_index),
+)
@@ -1,10 +1,9 @@
 -- Создание таблицы администраторов для авторизации в админ-панели
 -- Таблица используется для хранения учетных данных администраторов и управления доступом
+-- Шаг 0004 версионированных миграций (db/migrations.py); идемпотентен —
+-- существующая таблица не пересоздаётся (колонку email добавляет шаг 0003).
 
--- Удаление таблицы, если она существует (для пересоздания с новым полем email)
-DROP TABLE IF EXISTS admins CASCADE;
-
-CREATE TABLE admins (
+CREATE TABLE IF NOT EXISTS admins (
     id SERIAL PRIMARY KEY,
     login VARCHAR(100) NOT NULL UNIQUE,
     email VARCHAR(255) NOT NULL UNIQUE,
@@ -15,8 +14,8 @@ CREATE TABLE admins (
 );
 
 -- Создание индексов для быстрого поиска по логину и email
-CREATE INDEX ix_admins_login ON admins(login);
-CREATE INDEX ix_admins_email ON admins(email);
+CREATE INDEX IF NOT EXISTS ix_admins_login ON admins(login);
+CREATE INDEX IF NOT EXISTS ix_admins_email ON admins(email);
 
 -- Комментарии к таблице и колонкам
 COMMENT ON TABLE admins IS 'Таблица администраторов для авторизации в админ-панели';
@@ -38,5 +37,6 @@ END;
 $$ language 'plpgsql';
 
 -- Триггер для автоматического обновления updated_at
+DROP TRIGGER IF EXISTS update_admins_updated_at ON admins;
 CREATE TRIGGER update_admins_updated_at BEFORE UPDATE ON admins
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
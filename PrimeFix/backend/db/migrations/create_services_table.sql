@@ -1,5 +1,5 @@
 -- Таблица услуг (каждая услуга — отдельная строка с названием и описанием).
--- Выполнить один раз, если таблица ещё не создана (create_all в приложении создаёт её при старте).
+-- Шаг 0002 версионированных миграций (db/migrations.py); при новой базе таблицу уже создал шаг 0001.
 
 CREATE TABLE IF NOT EXISTS services (
     id SERIAL PRIMARY KEY,
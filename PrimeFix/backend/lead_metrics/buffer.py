@@ -0,0 +1,242 @@
+"""Буфер отложенной записи (write-behind) для пакетов дозаписи трекера.
+
+PATCH в режиме дозаписи не ходит в БД: пакет сливается с уже ожидающим
+пакетом той же записи (точки дописываются, клики суммируются), а фоновая
+задача asyncio раз в METRICS_FLUSH_INTERVAL секунд (или при METRICS_FLUSH_MAX_PENDING
+ожидающих записях) сбрасывает всё одним UPDATE. Число транзакций зависит
+от интервала, а не от числа посетителей.
+
+Повторы пакетов (тот же seq после таймаута) отсекаются в памяти процесса,
+а при сбросе — ещё и по last_seq в БД (dedup): карта seq процесса теряется
+при перезапуске и не общая для воркеров, поэтому она лишь экономит работу.
+Слитый пакет несёт наибольший seq своих частей, поэтому первый пакет
+записи, seq которой процесс ещё не видел (возможно, повтор уже записанного),
+не сливается с последующими: он сбрасывается отдельным UPDATE и проверяется
+в БД сам по себе.
+
+Для такой записи роутер до submit читает её last_seq из БД (unseen +
+LeadMetricsRepository.last_seqs): несуществующая сессия получает 404, а
+не молча теряется при сбросе, и повтор уже записанного seq сразу получает
+applied = false.
+
+Буфер живёт в event loop приложения: submit вызывается из обработчиков
+без await, поэтому между проверкой seq и слиянием пакета переключения
+задач нет и блокировки не нужны.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+
+from backend.core.config import get_settings
+from backend.core.instrumentation import TRACKER_BUFFER_FLUSHED, TRACKER_BUFFER_PENDING
+from backend.core.database import AsyncSessionLocal
+from backend.lead_metrics.repository import LeadMetricsRepository
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних seq помнить для отсечения повторов
+_SEQ_MEMORY = 100_000
+
+
+@dataclass
+class _PendingDelta:
+    """Накопленные, но ещё не записанные изменения одной записи."""
+
+    seq: int
+    w: int | None = None
+    h: int | None = None
+    pts: list = field(default_factory=list)
+    clicks: Counter = field(default_factory=Counter)
+    seconds: int | None = None
+    return_count: int | None = None
+    # Принят без известного процессу seq записи — к нему не дописываем
+    unverified: bool = False
+
+    def absorb(self, newer: _PendingDelta) -> None:
+        """Дописать более поздний пакет в конец текущего."""
+        self.seq = max(self.seq, newer.seq)
+        self.w = newer.w or self.w
+        self.h = newer.h or self.h
+        self.pts.extend(newer.pts)
+        self.clicks.update(newer.clicks)
+        if newer.seconds is not None:
+            self.seconds = max(self.seconds or 0, newer.seconds)
+        if newer.return_count is not None:
+            self.return_count = newer.return_count
+
+    def as_row(self, metrics_id: int) -> dict:
+        return {
+            "id": metrics_id,
+            "seq": self.seq,
+            "w": self.w,
+            "h": self.h,
+            "pts": self.pts,
+            "clicks": dict(self.clicks),
+            "seconds": self.seconds,
+            "return_count": self.return_count,
+        }
+
+
+class MetricsWriteBuffer:
+    """Слияние пакетов по metrics_id и пакетный сброс в PostgreSQL."""
+
+    def __init__(self) -> None:
+        # metrics_id → 1–2 части: непроверенная (см. _PendingDelta.unverified)
+        # и слитые последующие пакеты
+        self._pending: dict[int, list[_PendingDelta]] = {}
+        self._last_seq: OrderedDict[int, int] = OrderedDict()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+        self._interval = 1.0
+        self._max_pending = 500
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Запуск фоновой задачи сброса (если включено в настройках).
+
+        Вызывается из работающего event loop (lifespan приложения).
+        """
+        settings = get_settings()
+        if not settings.METRICS_WRITE_BEHIND or self.running:
+            return
+        self._interval = settings.METRICS_FLUSH_INTERVAL
+        self._max_pending = settings.METRICS_FLUSH_MAX_PENDING
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="lead-metrics-flush")
+
+    async def stop(self) -> None:
+        """Остановка задачи с финальным сбросом всего накопленного."""
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+
+    def unseen(self, metrics_ids: set[int]) -> set[int]:
+        """Записи, seq которых процесс ещё не видел (их last_seq нужен из БД)."""
+        return {metrics_id for metrics_id in metrics_ids if metrics_id not in self._last_seq}
+
+    def submit(
+        self,
+        metrics_id: int,
+        seq: int,
+        pts: list | None = None,
+        clicks: dict[str, int] | None = None,
+        w: int | None = None,
+        h: int | None = None,
+        time_on_page_seconds: int | None = None,
+        return_count: int | None = None,
+        stored_seq: int | None = None,
+    ) -> bool:
+        """Поставить пакет в очередь. False — повтор уже принятого seq.
+
+        stored_seq — last_seq записи в БД, если процесс её seq ещё не видел.
+        """
+        delta = _PendingDelta(
+            seq=seq,
+            w=w,
+            h=h,
+            pts=[list(p) for p in pts or []],
+            clicks=Counter(clicks or {}),
+            seconds=time_on_page_seconds,
+            return_count=return_count,
+        )
+        last_seq = self._last_seq.get(metrics_id)
+        delta.unverified = last_seq is None
+        if last_seq is None:
+            last_seq = stored_seq
+        if last_seq is not None and last_seq >= seq:
+            return False
+        self._last_seq[metrics_id] = seq
+        self._last_seq.move_to_end(metrics_id)
+        if len(self._last_seq) > _SEQ_MEMORY:
+            self._last_seq.popitem(last=False)
+
+        _add_part(self._pending.setdefault(metrics_id, []), delta)
+        TRACKER_BUFFER_PENDING.set(len(self._pending))
+        if len(self._pending) >= self._max_pending:
+            self._wake.set()
+        return True
+
+    async def flush(self) -> int:
+        """Записать всё накопленное. Возвращает число записанных пакетов.
+
+        Обычно — одна транзакция; вторая нужна только записям, у которых
+        есть непроверенная часть.
+        """
+        batch, self._pending = self._pending, {}
+        TRACKER_BUFFER_PENDING.set(0)
+        if not batch:
+            return 0
+
+        written = 0
+        depth = max(len(parts) for parts in batch.values())
+        for level in range(depth):
+            rows = [
+                parts[level].as_row(metrics_id)
+                for metrics_id, parts in batch.items()
+                if len(parts) > level
+            ]
+            try:
+                async with AsyncSessionLocal() as db:
+                    updated = await LeadMetricsRepository.apply_deltas(db, rows, dedup=True)
+            except Exception:
+                unsaved = {
+                    metrics_id: parts[level:]
+                    for metrics_id, parts in batch.items()
+                    if len(parts) > level
+                }
+                logger.exception(
+                    "Lead metrics flush failed, %d sessions requeued", len(unsaved)
+                )
+                self._requeue(unsaved)
+                return written
+
+            TRACKER_BUFFER_FLUSHED.inc(len(updated))
+            written += len(updated)
+            skipped = len(rows) - len(updated)
+            if skipped:
+                logger.debug(
+                    "Lead metrics flush: %d sessions not found or already applied", skipped
+                )
+        return written
+
+    def _requeue(self, batch: dict[int, list[_PendingDelta]]) -> None:
+        """Вернуть несохранённый пакет в очередь перед более новыми данными."""
+        for metrics_id, older in batch.items():
+            for part in self._pending.get(metrics_id, []):
+                _add_part(older, part)
+            self._pending[metrics_id] = older
+        TRACKER_BUFFER_PENDING.set(len(self._pending))
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self._interval)
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Lead metrics flush loop error")
+
+
+def _add_part(parts: list[_PendingDelta], delta: _PendingDelta) -> None:
+    """Дописать пакет к последней части, если её seq проверять отдельно не нужно."""
+    if parts and not parts[-1].unverified and not delta.unverified:
+        parts[-1].absorb(delta)
+    else:
+        parts.append(delta)
+
+
+metrics_buffer = MetricsWriteBuffer()
@@ -0,0 +1,258 @@
+"""Серверная агрегация хитмэпа: плотность курсора на фиксированной сетке.
+
+Каждая траектория (пары uint16 из cursor_pts, см. trail.py) нормализуется по
+размерам страницы и раскладывается в сетку rows×cols (NumPy). Сетки
+завершённых суток (UTC) кэшируются в памяти процесса — повторный запрос
+за прошлые дни не читает сырые траектории из БД. Дозапись в сессию,
+созданную в закэшированные сутки (вкладка, открытая за полночь), сбрасывает
+сетки этих суток (invalidate_heatmap_days из репозитория).
+"""
+from __future__ import annotations
+
+import json
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.lead_metrics.model import LeadMetrics
+from backend.lead_metrics.trail import decode_points, parse_trail_json
+
+# Значения по умолчанию, если трекер не прислал размеры страницы
+_DEFAULT_W = 1920
+_DEFAULT_H = 3500
+
+# Сколько строк читать из БД за один проход курсора
+_YIELD_PER = 500
+
+# Максимум закэшированных суточных сеток (на все разрешения)
+_DAY_CACHE_SIZE = 512
+
+
+# ── Агрегат ──────────────────────────────────────────────────────────
+
+@dataclass
+class HeatmapAggregate:
+    """Сетка плотности и итоги по набору сессий."""
+
+    cols: int
+    rows: int
+    grid: np.ndarray = None
+    sessions: int = 0
+    clicks: int = 0
+    total_seconds: int = 0
+    buttons: Counter = field(default_factory=Counter)
+
+    def __post_init__(self) -> None:
+        if self.grid is None:
+            self.grid = np.zeros(self.rows * self.cols, dtype=np.int64)
+
+    def merge(self, other: HeatmapAggregate) -> None:
+        """Прибавить другой агрегат той же размерности."""
+        self.grid += other.grid
+        self.sessions += other.sessions
+        self.clicks += other.clicks
+        self.total_seconds += other.total_seconds
+        self.buttons.update(other.buttons)
+
+    def add_record(self, pts: np.ndarray, buttons_clicked, seconds, weight: float = 1.0) -> None:
+        """Учесть одну сессию трекера (pts — точки, нормализованные в [0, 1]).
+
+        weight > 1 — траектория прорежена: каждая точка представляет
+        несколько исходных.
+        """
+        self.sessions += 1
+        self.total_seconds += seconds or 0
+
+        for label, count in _parse_clicks(buttons_clicked).items():
+            self.buttons[label] += count
+            self.clicks += count
+
+        if len(pts):
+            ix = np.minimum((pts[:, 0] * self.cols).astype(np.int64), self.cols - 1)
+            iy = np.minimum((pts[:, 1] * self.rows).astype(np.int64), self.rows - 1)
+            counts = np.bincount(iy * self.cols + ix, minlength=self.grid.size)
+            if weight != 1.0:
+                counts = np.rint(counts * weight).astype(np.int64)
+            self.grid += counts
+
+    def grid_2d(self) -> list[list[int]]:
+        """Сетка в виде списка строк (для JSON)."""
+        return self.grid.reshape(self.rows, self.cols).tolist()
+
+
+# ── Разбор данных трекера ────────────────────────────────────────────
+
+def parse_cursor_points(raw: str | None) -> np.ndarray:
+    """Точки JSON-траектории, нормализованные в [0, 1], массивом формы (n, 2)."""
+    trail = parse_trail_json(raw)
+    if trail is None:
+        return np.empty((0, 2), dtype=np.float64)
+    return normalize_points(*trail)
+
+
+def normalize_points(w, h, pts: np.ndarray) -> np.ndarray:
+    """Пиксели страницы → доли [0, 1]; точки за пределами страницы отбрасываются."""
+    if not len(pts):
+        return np.empty((0, 2), dtype=np.float64)
+    arr = pts.astype(np.float64) / (_positive(w, _DEFAULT_W), _positive(h, _DEFAULT_H))
+    inside = np.all((arr >= 0) & (arr <= 1), axis=1)
+    return arr[inside]
+
+
+def _positive(value, default: float) -> float:
+    return float(value) if isinstance(value, (int, float)) and value > 0 else float(default)
+
+
+def _parse_clicks(raw: str | None) -> dict[str, int]:
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+    except (ValueError, TypeError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {str(k): v for k, v in data.items() if isinstance(v, int) and v > 0}
+
+
+# ── Кэш суточных сеток ───────────────────────────────────────────────
+
+_day_cache: OrderedDict[tuple[date, int, int], HeatmapAggregate] = OrderedDict()
+_day_cache_lock = threading.Lock()
+# Растёт при каждом сбросе: сетку, посчитанную до сброса, не кэшируем
+_day_cache_generation = 0
+
+
+def _cache_get(key: tuple[date, int, int]) -> HeatmapAggregate | None:
+    with _day_cache_lock:
+        agg = _day_cache.get(key)
+        if agg is not None:
+            _day_cache.move_to_end(key)
+        return agg
+
+
+def _cache_put(key: tuple[date, int, int], agg: HeatmapAggregate, generation: int) -> None:
+    with _day_cache_lock:
+        if generation != _day_cache_generation:
+            return
+        _day_cache[key] = agg
+        _day_cache.move_to_end(key)
+        while len(_day_cache) > _DAY_CACHE_SIZE:
+            _day_cache.popitem(last=False)
+
+
+def invalidate_heatmap_cache() -> None:
+    """Сбросить кэш суточных сеток (после удаления/изменения старых сессий)."""
+    global _day_cache_generation
+    with _day_cache_lock:
+        _day_cache_generation += 1
+        _day_cache.clear()
+
+
+def invalidate_heatmap_days(*created_at: datetime | None) -> None:
+    """Сбросить сетки суток, в которые созданы изменённые сессии (все разрешения)."""
+    global _day_cache_generation
+    # Текущие сутки не кэшируются — обычная дозапись трекера ничего не сбрасывает
+    today = datetime.now(timezone.utc).date()
+    days = {value.astimezone(timezone.utc).date() for value in created_at if value is not None}
+    days.discard(today)
+    if not days:
+        return
+    with _day_cache_lock:
+        _day_cache_generation += 1
+        for key in [key for key in _day_cache if key[0] in days]:
+            del _day_cache[key]
+
+
+# ── Построение хитмэпа ───────────────────────────────────────────────
+
+def build_heatmap(
+    db: Session,
+    date_from: date | None,
+    date_to: date | None,
+    cols: int,
+    rows: int,
+) -> tuple[HeatmapAggregate, date, date]:
+    """Агрегат за диапазон дат включительно (UTC) и фактические границы."""
+    today = datetime.now(timezone.utc).date()
+    if date_to is None or date_to > today:
+        date_to = today
+    if date_from is None:
+        first = db.query(func.min(LeadMetrics.created_at)).scalar()
+        date_from = first.astimezone(timezone.utc).date() if first else today
+
+    total = HeatmapAggregate(cols=cols, rows=rows)
+    if date_from > date_to:
+        return total, date_from, date_to
+
+    # Завершённые сутки — из кэша; недостающие считаем одним проходом
+    last_closed = min(date_to, today - timedelta(days=1))
+    generation = _day_cache_generation
+    missing: list[date] = []
+    day = date_from
+    while day <= last_closed:
+        cached = _cache_get((day, cols, rows))
+        if cached is None:
+            missing.append(day)
+        else:
+            total.merge(cached)
+        day += timedelta(days=1)
+
+    if missing:
+        per_day = _aggregate_by_day(db, missing[0], missing[-1], cols, rows)
+        for day in missing:
+            agg = per_day.get(day) or HeatmapAggregate(cols=cols, rows=rows)
+            _cache_put((day, cols, rows), agg, generation)
+            total.merge(agg)
+
+    # Текущие сутки ещё пополняются — всегда считаем заново
+    if date_to == today:
+        live = _aggregate_by_day(db, today, today, cols, rows).get(today)
+        if live is not None:
+            total.merge(live)
+
+    return total, date_from, date_to
+
+
+def _aggregate_by_day(
+    db: Session, first: date, last: date, cols: int, rows: int
+) -> dict[date, HeatmapAggregate]:
+    """Потоковый проход по сессиям [first, last] с разбивкой по суткам."""
+    start = datetime.combine(first, time.min, tzinfo=timezone.utc)
+    end = datetime.combine(last + timedelta(days=1), time.min, tzinfo=timezone.utc)
+    query = (
+        db.query(
+            LeadMetrics.created_at,
+            LeadMetrics.cursor_w,
+            LeadMetrics.cursor_h,
+            LeadMetrics.cursor_pts,
+            LeadMetrics.cursor_pts_total,
+            LeadMetrics.cursor_hover_json,
+            LeadMetrics.buttons_clicked,
+            LeadMetrics.time_on_page_seconds,
+        )
+        .filter(LeadMetrics.created_at >= start, LeadMetrics.created_at < end)
+        .execution_options(yield_per=_YIELD_PER)
+    )
+
+    result: dict[date, HeatmapAggregate] = {}
+    for created_at, w, h, pts, pts_total, legacy, buttons, seconds in query:
+        day = created_at.astimezone(timezone.utc).date()
+        agg = result.get(day)
+        if agg is None:
+            agg = result[day] = HeatmapAggregate(cols=cols, rows=rows)
+        weight = 1.0
+        if pts is not None:
+            decoded = decode_points(pts)
+            if pts_total and len(decoded):
+                weight = pts_total / len(decoded)
+            points = normalize_points(w, h, decoded)
+        else:
+            points = parse_cursor_points(legacy)
+        agg.add_record(points, buttons, seconds, weight)
+    return result
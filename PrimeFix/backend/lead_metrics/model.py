@@ -1,7 +1,11 @@
 """Модель метрик поведения пользователя на странице."""
-from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey
+from sqlalchemy import (
+    BigInteger, Column, Date, DateTime, ForeignKey, Index, Integer, LargeBinary, Text, text,
+)
 from sqlalchemy.sql import func
 
+from backend.lead_metrics.trail import encode_points, parse_trail_json, trail_to_json
+
 from backend.core.database import Base
 
 
@@ -10,9 +14,26 @@ class LeadMetrics(Base):
 
     Может быть привязана к заявке (lead_id) или существовать как
     самостоятельная запись трекера поведения (lead_id = NULL).
+
+    Таблица секционирована по месяцам created_at (lead_metrics/partitions.py),
+    поэтому первичный ключ в БД — (id, created_at); для ORM запись
+    по-прежнему определяется одним id. Поиск и дозапись по одному id
+    (трекер знает только id) не отсекают секции: запрос проверяет индекс
+    первичного ключа каждой секции, и его цена растёт с числом хранимых
+    месяцев — поэтому METRICS_PARTITIONS_KEEP_MONTHS стоит задавать.
     """
 
     __tablename__ = "lead_metrics"
+    __table_args__ = (
+        Index("ix_lead_metrics_created_at", "created_at"),
+        # Прореживание старых траекторий (retention.py): ещё не прореженные
+        # сессии в порядке created_at, id
+        Index(
+            "ix_lead_metrics_full_trails", "created_at", "id",
+            postgresql_where=text("cursor_pts_total IS NULL AND cursor_pts IS NOT NULL"),
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     lead_id = Column(
@@ -23,8 +44,65 @@ class LeadMetrics(Base):
     )
     time_on_page_seconds = Column(Integer, default=0, nullable=False)
     buttons_clicked = Column(Text, nullable=True)
-    cursor_hover_data = Column(Text, nullable=True)
+    # Траектория курсора: размеры страницы и пары uint16 (lead_metrics/trail.py).
+    # В API доступна как JSON через свойство cursor_hover_data.
+    cursor_w = Column(Integer, nullable=True)
+    cursor_h = Column(Integer, nullable=True)
+    cursor_pts = Column(LargeBinary, nullable=True)
+    # Число точек до прореживания старой траектории (retention.py); NULL — полная
+    cursor_pts_total = Column(Integer, nullable=True)
+    # Исходный текст, если он не разбирается как траектория (старые записи)
+    cursor_hover_json = Column("cursor_hover_data", Text, nullable=True)
     return_count = Column(Integer, default=0, nullable=False)
     raw_metrics = Column(Text, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Последний применённый номер пакета дозаписи (защита от повторов)
+    last_seq = Column(Integer, default=0, server_default="0", nullable=False)
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __mapper_args__ = {"primary_key": [id]}
+
+    @property
+    def cursor_hover_data(self) -> str | None:
+        """Траектория в JSON-формате трекера {"w", "h", "pts": [[x, y], ...]}."""
+        if self.cursor_pts is not None:
+            return trail_to_json(self.cursor_w, self.cursor_h, self.cursor_pts)
+        return self.cursor_hover_json
+
+    @cursor_hover_data.setter
+    def cursor_hover_data(self, raw: str | None) -> None:
+        trail = parse_trail_json(raw)
+        self.cursor_pts_total = None
+        if trail is None:
+            self.cursor_w = self.cursor_h = self.cursor_pts = None
+            self.cursor_hover_json = raw
+            return
+        self.cursor_w, self.cursor_h, pts = trail
+        self.cursor_pts = encode_points(pts)
+        self.cursor_hover_json = None
+
+
+class LeadMetricsHourly(Base):
+    """Почасовые итоги сессий трекера (по часу создания сессии, UTC).
+
+    Поддерживается инкрементально (lead_metrics/rollup.py): при записи
+    сессии её час помечается изменённым и пересчитывается фоновой задачей.
+    """
+
+    __tablename__ = "lead_metrics_hourly"
+
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    sessions = Column(Integer, nullable=False, default=0)
+    total_seconds = Column(BigInteger, nullable=False, default=0)
+    clicks = Column(BigInteger, nullable=False, default=0)
+
+
+class LeadMetricsDaily(Base):
+    """Суточные итоги сессий трекера (сумма почасовых, сутки UTC)."""
+
+    __tablename__ = "lead_metrics_daily"
+
+    day = Column(Date, primary_key=True)
+    sessions = Column(Integer, nullable=False, default=0)
+    total_seconds = Column(BigInteger, nullable=False, default=0)
+    clicks = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,338 @@
+"""Помесячные секции таблицы lead_metrics (RANGE по created_at, UTC).
+
+Секция месяца называется lead_metrics_yYYYYmMM и покрывает
+[1-е число 00:00 UTC; 1-е число следующего месяца). Секции на
+METRICS_PARTITIONS_AHEAD месяцев вперёд создаются миграцией и затем
+фоновой задачей приложения; старые месяцы удаляются целиком (DROP TABLE
+секции) вместо построчного DELETE — вручную или автоматически при
+METRICS_PARTITIONS_KEEP_MONTHS > 0. Почасовые и суточные итоги
+(rollup.py) при этом сохраняются.
+
+Секция lead_metrics_default (DEFAULT) принимает строки, для месяца которых
+секции нет (фоновая задача не работала несколько месяцев), — вставка
+трекера не падает. Когда секция месяца создаётся позже, его строки
+переносятся в неё из DEFAULT.
+
+Перевод существующей таблицы с данными — отдельная команда (--convert):
+строки копируются под эксклюзивной блокировкой, и трекер на это время
+ждёт, поэтому при старте приложения миграция секционирует только пустую
+таблицу.
+
+Вручную:
+
+    python -m backend.lead_metrics.partitions                 # создать будущие секции
+    python -m backend.lead_metrics.partitions --convert       # секционировать таблицу с данными
+    python -m backend.lead_metrics.partitions --drop-before 2025-01
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import re
+import sys
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from backend.core.config import get_settings
+from backend.lead_metrics.model import LeadMetrics
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "lead_metrics"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+
+# Ключ pg_advisory_xact_lock для создания/удаления секций
+_LOCK_KEY = 7_310_014
+
+# Период проверки секций фоновой задачей, секунд
+_MAINTAIN_EVERY = 6 * 3600
+
+_NAME_RE = re.compile(r"^lead_metrics_y(\d{4})m(\d{2})$")
+
+
+# ── Месяцы и имена секций ────────────────────────────────────────────
+
+def month_bounds(month: date) -> tuple[datetime, datetime]:
+    """Границы секции месяца [начало; начало следующего) в UTC."""
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    end = add_months(month, 1)
+    return start, datetime(end.year, end.month, 1, tzinfo=timezone.utc)
+
+
+def month_start(value: date | datetime) -> date:
+    """Первое число месяца (для datetime — по UTC)."""
+    if isinstance(value, datetime):
+        value = value.astimezone(timezone.utc).date()
+    return value.replace(day=1)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+# ── Каталог ──────────────────────────────────────────────────────────
+
+def is_partitioned(conn: Connection) -> bool:
+    """lead_metrics уже секционирована (relkind = 'p')."""
+    return conn.execute(
+        text(
+            "SELECT c.relkind = 'p' FROM pg_class c "
+            "WHERE c.oid = to_regclass(:table)"
+        ),
+        {"table": PARENT_TABLE},
+    ).scalar() is True
+
+
+def list_partitions(conn: Connection) -> dict[date, str]:
+    """Помесячные секции: первое число месяца → имя таблицы."""
+    names = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ),
+        {"table": PARENT_TABLE},
+    ).scalars()
+    result: dict[date, str] = {}
+    for name in names:
+        match = _NAME_RE.match(name)
+        if match:
+            result[date(int(match[1]), int(match[2]), 1)] = name
+    return dict(sorted(result.items()))
+
+
+# ── Создание и удаление ──────────────────────────────────────────────
+
+def ensure_partitions(
+    conn: Connection, months_ahead: int, since: date | datetime | None = None
+) -> list[str]:
+    """Создать DEFAULT-секцию и недостающие секции от месяца since (по
+    умолчанию текущего) до текущего + months_ahead включительно.
+    Возвращает имена созданных."""
+    today = datetime.now(timezone.utc).date()
+    first = month_start(since or today)
+    last = add_months(month_start(today), months_ahead)
+    conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _LOCK_KEY})
+    existing = list_partitions(conn)
+
+    created: list[str] = []
+    if conn.execute(text("SELECT to_regclass(:t)"), {"t": DEFAULT_PARTITION}).scalar() is None:
+        conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+        created.append(DEFAULT_PARTITION)
+    month = first
+    while month <= last:
+        if month not in existing:
+            _create_partition(conn, month)
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    if created:
+        logger.info("Created lead_metrics partitions: %s", ", ".join(created))
+    return created
+
+
+def _create_partition(conn: Connection, month: date) -> None:
+    """Секция месяца; строки этого месяца из DEFAULT-секции переносятся в неё."""
+    name = partition_name(month)
+    start, end = month_bounds(month)
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    in_month = "created_at >= :start AND created_at < :end"
+    params = {"start": start, "end": end}
+    stray = conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month})"), params
+    ).scalar()
+    if not stray:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} FOR VALUES {bounds}"))
+        return
+
+    # Пока строки месяца лежат в DEFAULT, секцию с его границами создать
+    # нельзя: переносим их в отдельную таблицу и подключаем её секцией
+    columns = ", ".join(c.name for c in LeadMetrics.__table__.columns)
+    conn.execute(
+        text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    )
+    moved = conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_month} "
+            f"RETURNING {columns}) "
+            f"INSERT INTO {name} ({columns}) SELECT {columns} FROM moved"
+        ),
+        params,
+    ).rowcount
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    logger.warning("Moved %d rows from %s to %s", moved, DEFAULT_PARTITION, name)
+
+
+def drop_partitions_before(conn: Connection, month: date) -> list[str]:
+    """Удалить секции месяцев раньше month целиком. Возвращает имена удалённых."""
+    conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _LOCK_KEY})
+    dropped: list[str] = []
+    for start, name in list_partitions(conn).items():
+        if start < month_start(month):
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    if dropped:
+        logger.info("Dropped lead_metrics partitions: %s", ", ".join(dropped))
+    return dropped
+
+
+def convert_to_partitioned(conn: Connection, months_ahead: int) -> int:
+    """Секционировать обычную таблицу lead_metrics. Возвращает число строк.
+
+    Существующая таблица переименовывается, данные копируются в новую
+    (секции создаются от самого старого месяца), затем старая удаляется.
+    Всё время копирования таблица под ACCESS EXCLUSIVE: вставки и дозапись
+    трекера ждут блокировку.
+    """
+    conn.execute(text(f"LOCK TABLE {PARENT_TABLE} IN ACCESS EXCLUSIVE MODE"))
+    # Освобождаем имена индексов и последовательности для новой таблицы
+    index_names = conn.execute(
+        text(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = :table"
+        ),
+        {"table": PARENT_TABLE},
+    ).scalars().all()
+    for name in index_names:
+        conn.execute(text(f'ALTER INDEX "{name}" RENAME TO "{name}_old"'))
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {PARENT_TABLE}_old"))
+    conn.execute(
+        text(f"ALTER SEQUENCE IF EXISTS {PARENT_TABLE}_id_seq RENAME TO {PARENT_TABLE}_id_seq_old")
+    )
+
+    LeadMetrics.__table__.create(conn)
+    oldest = conn.execute(text(f"SELECT min(created_at) FROM {PARENT_TABLE}_old")).scalar()
+    ensure_partitions(conn, months_ahead, since=oldest)
+
+    columns = [c.name for c in LeadMetrics.__table__.columns]
+    source = [
+        "COALESCE(created_at, updated_at, now())" if name == "created_at" else name
+        for name in columns
+    ]
+    copied = conn.execute(
+        text(
+            f"INSERT INTO {PARENT_TABLE} ({', '.join(columns)}) "
+            f"SELECT {', '.join(source)} FROM {PARENT_TABLE}_old"
+        )
+    ).rowcount
+    conn.execute(
+        text(
+            f"SELECT setval(pg_get_serial_sequence('{PARENT_TABLE}', 'id'), "
+            f"COALESCE((SELECT max(id) FROM {PARENT_TABLE}), 0) + 1, false)"
+        )
+    )
+    conn.execute(text(f"DROP TABLE {PARENT_TABLE}_old"))
+    logger.info("Partitioned lead_metrics: %d rows copied", copied)
+    return copied
+
+
+def maintain_partitions(engine: Engine) -> tuple[list[str], list[str]]:
+    """Будущие секции и (если настроено) удаление старых месяцев."""
+    settings = get_settings()
+    dropped: list[str] = []
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            logger.warning(
+                "lead_metrics is not partitioned, run "
+                "python -m backend.lead_metrics.partitions --convert"
+            )
+            return [], []
+        created = ensure_partitions(conn, settings.METRICS_PARTITIONS_AHEAD)
+        if settings.METRICS_PARTITIONS_KEEP_MONTHS > 0:
+            cutoff = add_months(
+                month_start(datetime.now(timezone.utc)),
+                -(settings.METRICS_PARTITIONS_KEEP_MONTHS - 1),
+            )
+            dropped = drop_partitions_before(conn, cutoff)
+    if dropped:
+        from backend.lead_metrics.heatmap import invalidate_heatmap_cache
+
+        invalidate_heatmap_cache()
+    return created, dropped
+
+
+# ── Фоновая задача ───────────────────────────────────────────────────
+
+class PartitionMaintainer:
+    """Периодическое создание будущих секций (и удаление старых)."""
+
+    def __init__(self) -> None:
+        self._engine: Engine | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, engine: Engine) -> None:
+        if not self.running:
+            self._engine = engine
+            self._task = asyncio.create_task(self._run(), name="lead-metrics-partitions")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(maintain_partitions, self._engine)
+            except Exception:
+                logger.exception("Lead metrics partition maintenance failed")
+            await asyncio.sleep(_MAINTAIN_EVERY)
+
+
+partition_maintainer = PartitionMaintainer()
+
+
+# ── CLI ──────────────────────────────────────────────────────────────
+
+def _parse_month(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError("ожидается месяц в формате YYYY-MM") from None
+
+
+def main(argv: list[str] | None = None) -> int:
+    from backend.core.database import engine
+
+    parser = argparse.ArgumentParser(description="Секции таблицы lead_metrics")
+    parser.add_argument(
+        "--convert", action="store_true",
+        help="секционировать таблицу с данными (трекер ждёт до конца копирования)",
+    )
+    parser.add_argument(
+        "--drop-before", type=_parse_month, default=None, metavar="YYYY-MM",
+        help="удалить секции месяцев раньше указанного",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            if not args.convert:
+                logger.error("lead_metrics is not partitioned yet, run with --convert")
+                return 1
+            convert_to_partitioned(conn, get_settings().METRICS_PARTITIONS_AHEAD)
+        ensure_partitions(conn, get_settings().METRICS_PARTITIONS_AHEAD)
+        if args.drop_before is not None:
+            drop_partitions_before(conn, args.drop_before)
+        for start, name in list_partitions(conn).items():
+            print(f"{start:%Y-%m}  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
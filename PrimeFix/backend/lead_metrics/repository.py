@@ -1,61 +1,305 @@
 """Репозиторий метрик поведения (CRUD)."""
-from sqlalchemy.orm import Session
+import base64
+import json
+import logging
 
+from sqlalchemy import select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.lead_metrics import rollup
+from backend.leads.model import Lead
+from backend.lead_metrics.heatmap import invalidate_heatmap_days
 from backend.lead_metrics.model import LeadMetrics
+from backend.lead_metrics.trail import encode_points
+
+logger = logging.getLogger(__name__)
+
+# Дозапись пакетов одним UPDATE: точки (пары uint16, base64 в пакете)
+# дописываются в конец cursor_pts, клики суммируются по ключам, без чтения
+# строк в приложение. С :dedup пакет применяется, только если его seq
+# больше уже применённого (повтор).
+_APPLY_DELTAS_SQL = text("""
+    WITH b AS (
+        SELECT * FROM jsonb_to_recordset(CAST(:batch AS jsonb)) AS x(
+            id integer, seq integer, w integer, h integer, pts text,
+            clicks jsonb, seconds integer, return_count integer
+        )
+    ),
+    cur AS (
+        SELECT
+            m.id,
+            COALESCE(NULLIF(m.buttons_clicked, '')::jsonb, '{}'::jsonb) AS buttons
+        FROM lead_metrics AS m
+        JOIN b ON b.id = m.id
+        WHERE NOT CAST(:dedup AS boolean) OR m.last_seq < b.seq
+        ORDER BY m.id
+        FOR UPDATE OF m
+    )
+    UPDATE lead_metrics AS m SET
+        cursor_w = COALESCE(b.w, m.cursor_w),
+        cursor_h = COALESCE(b.h, m.cursor_h),
+        cursor_pts = COALESCE(m.cursor_pts, ''::bytea) || decode(COALESCE(b.pts, ''), 'base64'),
+        buttons_clicked = CASE
+            WHEN COALESCE(b.clicks, '{}'::jsonb) = '{}'::jsonb THEN m.buttons_clicked
+            ELSE (
+                SELECT COALESCE(jsonb_object_agg(key, total), '{}'::jsonb)::text
+                FROM (
+                    SELECT key, SUM(value::bigint) AS total
+                    FROM (
+                        SELECT key, value FROM jsonb_each_text(cur.buttons)
+                        UNION ALL
+                        SELECT key, value FROM jsonb_each_text(b.clicks)
+                    ) AS kv
+                    GROUP BY key
+                ) AS agg
+            )
+        END,
+        time_on_page_seconds = GREATEST(m.time_on_page_seconds, COALESCE(b.seconds, 0)),
+        return_count = COALESCE(b.return_count, m.return_count),
+        last_seq = GREATEST(m.last_seq, b.seq),
+        updated_at = now()
+    FROM cur, b
+    WHERE m.id = cur.id AND b.id = cur.id
+    RETURNING m.id, m.created_at
+""")
 
 
 class LeadMetricsRepository:
     """CRUD-операции для LeadMetrics."""
 
     @staticmethod
-    def create(db: Session, **kwargs) -> LeadMetrics:
+    async def create(db: AsyncSession, **kwargs) -> LeadMetrics:
         """Создание новой записи метрик."""
         metrics = LeadMetrics(**kwargs)
         db.add(metrics)
-        db.commit()
-        db.refresh(metrics)
+        await db.commit()
+        await db.refresh(metrics)
+        _sessions_changed(metrics.created_at)
         return metrics
 
     @staticmethod
-    def get_by_id(db: Session, metrics_id: int) -> LeadMetrics | None:
+    async def create_many(db: AsyncSession, items: list[dict]) -> list[LeadMetrics]:
+        """Создание нескольких записей одним многострочным INSERT ... RETURNING."""
+        rows = [LeadMetrics(**item) for item in items]
+        db.add_all(rows)
+        await db.commit()
+        _sessions_changed(*(metrics.created_at for metrics in rows))
+        return rows
+
+    @staticmethod
+    async def missing_lead_ids(db: AsyncSession, lead_ids: set[int]) -> set[int]:
+        """Какие из lead_ids не существуют (проверка до вставки пакета)."""
+        if not lead_ids:
+            return set()
+        found = await db.scalars(select(Lead.id).where(Lead.id.in_(lead_ids)))
+        return lead_ids - set(found)
+
+    @staticmethod
+    async def get_by_id(db: AsyncSession, metrics_id: int) -> LeadMetrics | None:
         """Получение метрик по ID."""
-        return db.query(LeadMetrics).filter(LeadMetrics.id == metrics_id).first()
+        return await db.scalar(select(LeadMetrics).where(LeadMetrics.id == metrics_id))
 
     @staticmethod
-    def get_by_lead_id(db: Session, lead_id: int) -> LeadMetrics | None:
-        """Получение метрик по ID заявки."""
-        return db.query(LeadMetrics).filter(LeadMetrics.lead_id == lead_id).first()
+    async def last_seqs(db: AsyncSession, metrics_ids: set[int]) -> dict[int, int]:
+        """last_seq существующих записей; отсутствующих id в ответе нет."""
+        if not metrics_ids:
+            return {}
+        rows = await db.execute(
+            select(LeadMetrics.id, LeadMetrics.last_seq).where(LeadMetrics.id.in_(metrics_ids))
+        )
+        return dict(rows.all())
 
     @staticmethod
-    def get_all(db: Session, skip: int = 0, limit: int = 200) -> list[LeadMetrics]:
-        """Получение всех записей метрик (новые первыми)."""
-        return (
-            db.query(LeadMetrics)
-            .order_by(LeadMetrics.id.desc())
-            .offset(skip)
-            .limit(limit)
-            .all()
+    async def get_by_lead_id(db: AsyncSession, lead_id: int) -> LeadMetrics | None:
+        """Получение метрик по ID заявки."""
+        return await db.scalar(
+            select(LeadMetrics).where(LeadMetrics.lead_id == lead_id).limit(1)
         )
 
     @staticmethod
-    def update(db: Session, metrics_id: int, **kwargs) -> LeadMetrics | None:
+    async def get_all(
+        db: AsyncSession, skip: int = 0, limit: int = 200, before_id: int | None = None
+    ) -> list[LeadMetrics]:
+        """Получение всех записей метрик (новые первыми).
+
+        before_id — keyset-продолжение: записи с id меньше последнего
+        на предыдущей странице (вместо skip).
+        """
+        stmt = select(LeadMetrics).order_by(LeadMetrics.id.desc())
+        if before_id is not None:
+            stmt = stmt.where(LeadMetrics.id < before_id)
+        elif skip:
+            stmt = stmt.offset(skip)
+        result = await db.scalars(stmt.limit(limit))
+        return list(result)
+
+    @staticmethod
+    async def update(db: AsyncSession, metrics_id: int, **kwargs) -> LeadMetrics | None:
         """Обновление метрик по ID."""
-        metrics = LeadMetricsRepository.get_by_id(db, metrics_id)
+        metrics = await LeadMetricsRepository.get_by_id(db, metrics_id)
         if not metrics:
             return None
         for key, value in kwargs.items():
             if hasattr(metrics, key):
                 setattr(metrics, key, value)
-        db.commit()
-        db.refresh(metrics)
+        await db.commit()
+        await db.refresh(metrics)
+        _sessions_changed(metrics.created_at)
         return metrics
 
     @staticmethod
-    def delete(db: Session, metrics_id: int) -> bool:
+    async def append(
+        db: AsyncSession,
+        metrics_id: int,
+        seq: int,
+        pts: list | None = None,
+        clicks: dict[str, int] | None = None,
+        w: int | None = None,
+        h: int | None = None,
+        time_on_page_seconds: int | None = None,
+        return_count: int | None = None,
+    ) -> bool | None:
+        """Дозапись пакета точек и кликов.
+
+        True — пакет применён, False — повтор (seq уже применён),
+        None — запись не найдена.
+        """
+        delta = {
+            "id": metrics_id,
+            "seq": seq,
+            "w": w,
+            "h": h,
+            "pts": [list(p) for p in pts or []],
+            "clicks": clicks or {},
+            "seconds": time_on_page_seconds,
+            "return_count": return_count,
+        }
+        if metrics_id in await LeadMetricsRepository.apply_deltas(db, [delta], dedup=True):
+            return True
+        exists = await db.scalar(select(LeadMetrics.id).where(LeadMetrics.id == metrics_id))
+        return False if exists else None
+
+    @staticmethod
+    async def append_many(db: AsyncSession, deltas: list[dict]) -> set[tuple[int, int]]:
+        """Пакеты дозаписи нескольких сессий (формат apply_deltas) с отсечением повторов.
+
+        Пакеты одной сессии применяются по возрастанию seq: k-й пакет каждой
+        сессии попадает в k-й многострочный UPDATE (обычно он один).
+        Возвращает пары (id, seq) применённых пакетов.
+        """
+        rounds: list[list[dict]] = []
+        depth: dict[int, int] = {}
+        for delta in sorted(deltas, key=lambda d: d["seq"]):
+            k = depth.get(delta["id"], 0)
+            depth[delta["id"]] = k + 1
+            if k == len(rounds):
+                rounds.append([])
+            rounds[k].append(delta)
+
+        applied: set[tuple[int, int]] = set()
+        for batch in rounds:
+            seqs = {delta["id"]: delta["seq"] for delta in batch}
+            updated = await LeadMetricsRepository.apply_deltas(db, batch, dedup=True)
+            applied.update((metrics_id, seqs[metrics_id]) for metrics_id in updated)
+        return applied
+
+    @staticmethod
+    async def apply_deltas(
+        db: AsyncSession, deltas: list[dict], dedup: bool = False
+    ) -> set[int]:
+        """Применение пакетов дозаписи одной транзакцией.
+
+        Каждый пакет — dict с ключами id, seq, w, h, pts, clicks, seconds,
+        return_count (по одному на запись). Возвращает ID обновлённых записей.
+        """
+        if not deltas:
+            return set()
+        batch = [
+            {**delta, "pts": base64.b64encode(encode_points(delta["pts"])).decode("ascii")}
+            for delta in deltas
+        ]
+        try:
+            result = await db.execute(
+                _APPLY_DELTAS_SQL, {"batch": json.dumps(batch), "dedup": dedup}
+            )
+            rows = result.all()
+        except DBAPIError as exc:
+            if not _is_data_error(exc):
+                raise
+            await db.rollback()
+            if len(deltas) > 1:
+                # Ищем испорченную запись: применяем пакеты по одному
+                updated: set[int] = set()
+                for delta in deltas:
+                    updated |= await LeadMetricsRepository.apply_deltas(db, [delta], dedup)
+                return updated
+            # В buttons_clicked лежит не-JSON (старый или испорченный снимок) —
+            # сливаем в приложении и перезаписываем корректным JSON.
+            logger.warning(
+                "Corrupted metrics JSON in lead_metrics id=%s, rewriting", deltas[0]["id"]
+            )
+            applied = await LeadMetricsRepository._append_fallback(db, deltas[0], dedup)
+            return {deltas[0]["id"]} if applied else set()
+        await db.commit()
+        _sessions_changed(*(row.created_at for row in rows))
+        return {row.id for row in rows}
+
+    @staticmethod
+    async def _append_fallback(db: AsyncSession, delta: dict, dedup: bool) -> bool:
+        metrics = await db.scalar(
+            select(LeadMetrics).where(LeadMetrics.id == delta["id"]).with_for_update()
+        )
+        if not metrics or (dedup and metrics.last_seq >= delta["seq"]):
+            await db.rollback()
+            return False
+        buttons = _loads_dict(metrics.buttons_clicked)
+        metrics.cursor_w = delta["w"] or metrics.cursor_w
+        metrics.cursor_h = delta["h"] or metrics.cursor_h
+        metrics.cursor_pts = (metrics.cursor_pts or b"") + encode_points(delta["pts"])
+        for label, count in delta["clicks"].items():
+            prev = buttons.get(label)
+            buttons[label] = (prev if isinstance(prev, int) else 0) + count
+        metrics.buttons_clicked = json.dumps(buttons, ensure_ascii=False)
+        metrics.time_on_page_seconds = max(
+            metrics.time_on_page_seconds, delta["seconds"] or 0
+        )
+        if delta["return_count"] is not None:
+            metrics.return_count = delta["return_count"]
+        metrics.last_seq = max(metrics.last_seq, delta["seq"])
+        created_at = metrics.created_at
+        await db.commit()
+        _sessions_changed(created_at)
+        return True
+
+    @staticmethod
+    async def delete(db: AsyncSession, metrics_id: int) -> bool:
         """Удаление метрик по ID."""
-        metrics = LeadMetricsRepository.get_by_id(db, metrics_id)
+        metrics = await LeadMetricsRepository.get_by_id(db, metrics_id)
         if not metrics:
             return False
-        db.delete(metrics)
-        db.commit()
+        created_at = metrics.created_at
+        await db.delete(metrics)
+        await db.commit()
+        _sessions_changed(created_at)
         return True
+
+
+def _sessions_changed(*created_at) -> None:
+    """Сессии записаны: пересчитать их часы в итогах и сбросить сетки их суток."""
+    rollup.mark_dirty(*created_at)
+    invalidate_heatmap_days(*created_at)
+
+
+def _is_data_error(exc: DBAPIError) -> bool:
+    """Ошибка данных (SQLSTATE класса 22): asyncpg не переводит её в DataError."""
+    return (getattr(exc.orig, "pgcode", None) or "").startswith("22")
+
+
+def _loads_dict(raw: str | None) -> dict:
+    """JSON-объект из текстовой колонки; при ошибке — пустой словарь."""
+    try:
+        data = json.loads(raw) if raw else {}
+    except (ValueError, TypeError):
+        return {}
+    return data if isinstance(data, dict) else {}
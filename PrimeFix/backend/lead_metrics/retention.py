@@ -0,0 +1,199 @@
+"""Хранение старых данных трекера: прореживание траекторий и удаление
+непривязанных сессий.
+
+Полные траектории нужны только для свежих сессий. Раз в
+METRICS_RETENTION_INTERVAL секунд фоновая задача:
+
+* в сессиях старше METRICS_TRAIL_FULL_DAYS дней оставляет каждую
+  METRICS_TRAIL_DOWNSAMPLE_STEP-ю точку траектории; исходное число точек
+  сохраняется в cursor_pts_total, и хитмэп учитывает оставшиеся точки
+  с весом — плотность за старые дни сохраняется. Клики и время не меняются;
+* удаляет сессии без заявки (lead_id IS NULL) старше
+  METRICS_UNLINKED_RETENTION_DAYS дней. Почасовые/суточные итоги
+  (rollup.py) не пересчитываются и остаются прежними.
+
+Работа идёт пачками по METRICS_RETENTION_BATCH строк, каждая — в своей
+короткой транзакции; заблокированные строки пропускаются (SKIP LOCKED),
+поэтому задача не мешает трекеру и может идти в нескольких воркерах.
+Значение 0 в настройке дней отключает соответствующий шаг.
+
+Разовый проход вручную:
+
+    python -m backend.lead_metrics.retention
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.core.config import get_settings
+from backend.core.database import AsyncSessionLocal
+from backend.lead_metrics.heatmap import invalidate_heatmap_cache
+from backend.lead_metrics.trail import POINT_DTYPE, downsample_points
+
+logger = logging.getLogger(__name__)
+
+# Пауза между пачками, секунд
+_BATCH_PAUSE = 0.05
+
+_SELECT_FULL_TRAILS_SQL = text("""
+    SELECT id, created_at, cursor_pts
+    FROM lead_metrics
+    WHERE created_at < :cutoff
+      AND cursor_pts IS NOT NULL
+      AND cursor_pts_total IS NULL
+    ORDER BY created_at, id
+    LIMIT :n
+    FOR UPDATE SKIP LOCKED
+""")
+
+_STORE_DOWNSAMPLED_SQL = text("""
+    UPDATE lead_metrics
+    SET cursor_pts = :pts, cursor_pts_total = :total
+    WHERE id = :id AND created_at = :created_at
+""")
+
+_DELETE_UNLINKED_SQL = text("""
+    DELETE FROM lead_metrics
+    WHERE (id, created_at) IN (
+        SELECT id, created_at
+        FROM lead_metrics
+        WHERE lead_id IS NULL AND created_at < :cutoff
+        ORDER BY created_at
+        LIMIT :n
+        FOR UPDATE SKIP LOCKED
+    )
+""")
+
+
+# ── Пачки ────────────────────────────────────────────────────────────
+
+async def downsample_batch(db: AsyncSession, cutoff: datetime, step: int, limit: int) -> int:
+    """Проредить траектории одной пачки сессий старше cutoff. Возвращает число строк."""
+    rows = (await db.execute(_SELECT_FULL_TRAILS_SQL, {"cutoff": cutoff, "n": limit})).all()
+    if not rows:
+        return 0
+    point_size = 2 * POINT_DTYPE.itemsize
+    await db.execute(
+        _STORE_DOWNSAMPLED_SQL,
+        [
+            {
+                "id": row.id,
+                "created_at": row.created_at,
+                "pts": downsample_points(row.cursor_pts, step),
+                "total": len(row.cursor_pts) // point_size,
+            }
+            for row in rows
+        ],
+    )
+    await db.commit()
+    return len(rows)
+
+
+async def delete_unlinked_batch(db: AsyncSession, cutoff: datetime, limit: int) -> int:
+    """Удалить пачку сессий без заявки старше cutoff. Возвращает число строк."""
+    result = await db.execute(_DELETE_UNLINKED_SQL, {"cutoff": cutoff, "n": limit})
+    await db.commit()
+    return result.rowcount
+
+
+async def _drain(batch, limit: int) -> int:
+    """Повторять пачку, пока она заполняется целиком."""
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            done = await batch(db)
+        total += done
+        if done < limit:
+            return total
+        await asyncio.sleep(_BATCH_PAUSE)
+
+
+async def run_retention() -> tuple[int, int]:
+    """Один полный проход. Возвращает (прорежено, удалено)."""
+    settings = get_settings()
+    now = datetime.now(timezone.utc)
+    limit = settings.METRICS_RETENTION_BATCH
+    downsampled = deleted = 0
+
+    if settings.METRICS_TRAIL_FULL_DAYS > 0:
+        cutoff = now - timedelta(days=settings.METRICS_TRAIL_FULL_DAYS)
+        step = settings.METRICS_TRAIL_DOWNSAMPLE_STEP
+        downsampled = await _drain(
+            lambda db: downsample_batch(db, cutoff, step, limit), limit
+        )
+    if settings.METRICS_UNLINKED_RETENTION_DAYS > 0:
+        cutoff = now - timedelta(days=settings.METRICS_UNLINKED_RETENTION_DAYS)
+        deleted = await _drain(lambda db: delete_unlinked_batch(db, cutoff, limit), limit)
+
+    if deleted:
+        invalidate_heatmap_cache()
+    if downsampled or deleted:
+        logger.info(
+            "Lead metrics retention: %d trails downsampled, %d sessions deleted",
+            downsampled, deleted,
+        )
+    return downsampled, deleted
+
+
+# ── Фоновая задача ───────────────────────────────────────────────────
+
+class RetentionJob:
+    """Периодический запуск run_retention."""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._interval = 3600.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._interval = get_settings().METRICS_RETENTION_INTERVAL
+        self._task = asyncio.create_task(self._run(), name="lead-metrics-retention")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await run_retention()
+            except Exception:
+                logger.exception("Lead metrics retention failed")
+
+
+retention_job = RetentionJob()
+
+
+def main() -> int:
+    from backend.core.database import async_engine
+
+    async def _once() -> tuple[int, int]:
+        try:
+            return await run_retention()
+        finally:
+            await async_engine.dispose()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    downsampled, deleted = asyncio.run(_once())
+    print(f"downsampled={downsampled} deleted={deleted}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
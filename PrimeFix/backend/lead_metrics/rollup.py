@@ -0,0 +1,216 @@
+"""Инкрементальные почасовые и суточные итоги метрик поведения.
+
+Репозиторий помечает час создания каждой записанной сессии как
+изменённый (mark_dirty); фоновая задача раз в METRICS_ROLLUP_INTERVAL
+секунд пересчитывает только эти часы из сырых lead_metrics, а затем
+суточные строки — суммой почасовых. Пересчёт бакета идемпотентен,
+поэтому повтор (или параллельный пересчёт в другом воркере) безопасен.
+
+Средние за сутки/неделю/месяц читаются из lead_metrics_daily — не больше
+31 строки независимо от объёма истории.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.core.config import get_settings
+from backend.core.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних часов пересчитать при старте (пометки прошлого
+# процесса потеряны при перезапуске)
+_STARTUP_LOOKBACK_HOURS = 24
+
+# Сумма целых значений счётчика кликов; строки с не-JSON пропускаются
+CLICKS_SQL = """
+    CASE WHEN pg_input_is_valid(m.buttons_clicked, 'jsonb') THEN
+        CASE WHEN jsonb_typeof(m.buttons_clicked::jsonb) = 'object' THEN (
+            SELECT COALESCE(SUM(value::bigint), 0)
+            FROM jsonb_each_text(m.buttons_clicked::jsonb)
+            WHERE value ~ '^[0-9]{1,18}$'
+        ) ELSE 0 END
+    ELSE 0 END
+"""
+
+_REFRESH_HOURLY_SQL = text(f"""
+    INSERT INTO lead_metrics_hourly (bucket, sessions, total_seconds, clicks)
+    SELECT h.bucket, COUNT(m.id), COALESCE(SUM(m.time_on_page_seconds), 0),
+           COALESCE(SUM({CLICKS_SQL}), 0)
+    FROM unnest(CAST(:hours AS timestamptz[])) AS h(bucket)
+    LEFT JOIN lead_metrics AS m
+        ON m.created_at >= h.bucket AND m.created_at < h.bucket + interval '1 hour'
+    GROUP BY h.bucket
+    ON CONFLICT (bucket) DO UPDATE SET
+        sessions = EXCLUDED.sessions,
+        total_seconds = EXCLUDED.total_seconds,
+        clicks = EXCLUDED.clicks
+""")
+
+_REFRESH_DAILY_SQL = text("""
+    INSERT INTO lead_metrics_daily (day, sessions, total_seconds, clicks)
+    SELECT d.day, COALESCE(SUM(h.sessions), 0), COALESCE(SUM(h.total_seconds), 0),
+           COALESCE(SUM(h.clicks), 0)
+    FROM unnest(CAST(:days AS date[])) AS d(day)
+    LEFT JOIN lead_metrics_hourly AS h
+        ON h.bucket >= d.day::timestamp AT TIME ZONE 'UTC'
+       AND h.bucket < (d.day + 1)::timestamp AT TIME ZONE 'UTC'
+    GROUP BY d.day
+    ON CONFLICT (day) DO UPDATE SET
+        sessions = EXCLUDED.sessions,
+        total_seconds = EXCLUDED.total_seconds,
+        clicks = EXCLUDED.clicks
+""")
+
+# Полное построение итогов по всей истории (миграция)
+BACKFILL_HOURLY_SQL = f"""
+    INSERT INTO lead_metrics_hourly (bucket, sessions, total_seconds, clicks)
+    SELECT date_trunc('hour', m.created_at, 'UTC'), COUNT(*),
+           SUM(m.time_on_page_seconds), SUM({CLICKS_SQL})
+    FROM lead_metrics AS m
+    WHERE m.created_at IS NOT NULL
+    GROUP BY 1
+    ON CONFLICT (bucket) DO NOTHING
+"""
+
+BACKFILL_DAILY_SQL = """
+    INSERT INTO lead_metrics_daily (day, sessions, total_seconds, clicks)
+    SELECT (bucket AT TIME ZONE 'UTC')::date, SUM(sessions), SUM(total_seconds), SUM(clicks)
+    FROM lead_metrics_hourly
+    GROUP BY 1
+    ON CONFLICT (day) DO NOTHING
+"""
+
+_PERIODS_SQL = text("""
+    SELECT
+        COALESCE(SUM(sessions) FILTER (WHERE day = :today), 0) AS day_sessions,
+        COALESCE(SUM(total_seconds) FILTER (WHERE day = :today), 0) AS day_seconds,
+        COALESCE(SUM(clicks) FILTER (WHERE day = :today), 0) AS day_clicks,
+        COALESCE(SUM(sessions) FILTER (WHERE day >= :week), 0) AS week_sessions,
+        COALESCE(SUM(total_seconds) FILTER (WHERE day >= :week), 0) AS week_seconds,
+        COALESCE(SUM(clicks) FILTER (WHERE day >= :week), 0) AS week_clicks,
+        COALESCE(SUM(sessions), 0) AS month_sessions,
+        COALESCE(SUM(total_seconds), 0) AS month_seconds,
+        COALESCE(SUM(clicks), 0) AS month_clicks
+    FROM lead_metrics_daily
+    WHERE day >= :month AND day <= :today
+""")
+
+
+# ── Пометка изменённых часов ─────────────────────────────────────────
+
+_dirty_hours: set[datetime] = set()
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    """Начало часа (UTC), к которому относится сессия."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def mark_dirty(*created_at: datetime | None) -> None:
+    """Пометить часы создания сессий для пересчёта итогов."""
+    for ts in created_at:
+        if ts is not None:
+            _dirty_hours.add(hour_bucket(ts))
+
+
+def mark_recent_dirty(hours: int) -> None:
+    """Пометить последние hours часов (включая текущий)."""
+    now = hour_bucket(datetime.now(timezone.utc))
+    _dirty_hours.update(now - timedelta(hours=i) for i in range(hours + 1))
+
+
+# ── Пересчёт и чтение ────────────────────────────────────────────────
+
+async def refresh_rollups(db: AsyncSession, hours: set[datetime]) -> None:
+    """Пересчитать указанные часы и сутки, в которые они входят."""
+    if not hours:
+        return
+    ordered = sorted(hours)
+    days = sorted({h.date() for h in ordered})
+    await db.execute(_REFRESH_HOURLY_SQL, {"hours": ordered})
+    await db.execute(_REFRESH_DAILY_SQL, {"days": days})
+    await db.commit()
+
+
+async def period_totals(db: AsyncSession, today: date) -> dict[str, dict[str, int]]:
+    """Итоги за сегодня, 7 и 30 суток (UTC, включая сегодня)."""
+    row = (
+        await db.execute(
+            _PERIODS_SQL,
+            {
+                "today": today,
+                "week": today - timedelta(days=6),
+                "month": today - timedelta(days=29),
+            },
+        )
+    ).mappings().one()
+    return {
+        period: {
+            "sessions": int(row[f"{period}_sessions"]),
+            "total_seconds": int(row[f"{period}_seconds"]),
+            "clicks": int(row[f"{period}_clicks"]),
+        }
+        for period in ("day", "week", "month")
+    }
+
+
+class RollupRefresher:
+    """Фоновая задача пересчёта помеченных часов."""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._interval = 60.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._interval = get_settings().METRICS_ROLLUP_INTERVAL
+        mark_recent_dirty(_STARTUP_LOOKBACK_HOURS)
+        self._task = asyncio.create_task(self._run(), name="lead-metrics-rollup")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.refresh()
+
+    async def refresh(self) -> int:
+        """Пересчитать всё помеченное. Возвращает число часов."""
+        hours = set(_dirty_hours)
+        _dirty_hours.difference_update(hours)
+        if not hours:
+            return 0
+        try:
+            async with AsyncSessionLocal() as db:
+                await refresh_rollups(db, hours)
+        except asyncio.CancelledError:
+            _dirty_hours.update(hours)
+            raise
+        except Exception:
+            logger.exception("Lead metrics rollup refresh failed")
+            _dirty_hours.update(hours)
+            return 0
+        return len(hours)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            await self.refresh()
+
+
+rollup_refresher = RollupRefresher()
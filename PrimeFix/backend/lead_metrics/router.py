@@ -3,42 +3,177 @@
 POST и PATCH — публичные (трекер на главной странице).
 GET и DELETE — защищены JWT (только для администратора).
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from datetime import date, datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.auth.dependencies import get_current_admin
 from backend.auth.model import Admin
-from backend.core.database import get_db
+from backend.core.database import SessionLocal, get_db
+from backend.core.instrumentation import TRACKER_DELTAS, TRACKER_SESSIONS
+from backend.core.pagination import decode_cursor, set_next_cursor
+from backend.core.responses import ListSerializer
+from backend.lead_metrics.buffer import metrics_buffer
+from backend.lead_metrics.heatmap import build_heatmap, invalidate_heatmap_cache
 from backend.lead_metrics.repository import LeadMetricsRepository
+from backend.lead_metrics.rollup import period_totals
 from backend.lead_metrics.schema import (
+    HeatmapResponse,
+    LeadMetricsAck,
+    LeadMetricsBatchCreated,
+    LeadMetricsBatchRequest,
+    LeadMetricsBatchResponse,
     LeadMetricsCreate,
     LeadMetricsResponse,
     LeadMetricsUpdate,
+    PeriodAveragesResponse,
+    PeriodTotals,
 )
 
 router = APIRouter(prefix="/lead-metrics", tags=["lead-metrics"])
 
+_metrics_serializer = ListSerializer(LeadMetricsResponse)
+
 
 # ── Публичные эндпоинты (трекер) ────────────────────────────────────
 
 
 @router.post("/", response_model=LeadMetricsResponse)
-def create_lead_metrics(
+async def create_lead_metrics(
     data: LeadMetricsCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Создание записи метрик (первый запрос от трекера)."""
-    return LeadMetricsRepository.create(db, **data.model_dump())
+    metrics = await LeadMetricsRepository.create(db, **data.model_dump())
+    TRACKER_SESSIONS.inc()
+    return metrics
+
+
+@router.post("/batch", response_model=LeadMetricsBatchResponse)
+async def batch_lead_metrics(
+    data: LeadMetricsBatchRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+):
+    """Несколько сессий одним запросом: новые записи — одним INSERT,
+    пакеты дозаписи — одним UPDATE (или в буфер отложенной записи, 202).
+
+    applied = false в подтверждении — повтор уже принятого seq или
+    сессия не найдена.
+    """
+    created: list[LeadMetricsBatchCreated] = []
+    if data.create:
+        lead_ids = {item.lead_id for item in data.create if item.lead_id is not None}
+        missing = await LeadMetricsRepository.missing_lead_ids(db, lead_ids)
+        if missing:
+            raise HTTPException(
+                status_code=422, detail=f"Unknown lead_id: {sorted(missing)}"
+            )
+        rows = await LeadMetricsRepository.create_many(
+            db, [item.model_dump(exclude={"ref"}) for item in data.create]
+        )
+        created = [
+            LeadMetricsBatchCreated(ref=item.ref, id=row.id)
+            for item, row in zip(data.create, rows)
+        ]
+        TRACKER_SESSIONS.inc(len(rows))
+
+    acks: list[LeadMetricsAck] = []
+    if data.deltas and metrics_buffer.running:
+        # Сессии, которых процесс ещё не видел, проверяем в БД одним запросом
+        unseen = metrics_buffer.unseen({d.id for d in data.deltas})
+        stored = await LeadMetricsRepository.last_seqs(db, unseen)
+        # Пакеты одной сессии — по возрастанию seq, иначе буфер примет
+        # более ранний за повтор
+        accepted: dict[int, bool] = {}
+        for i in sorted(range(len(data.deltas)), key=lambda i: data.deltas[i].seq):
+            d = data.deltas[i]
+            if d.id in unseen and d.id not in stored:
+                accepted[i] = False
+                continue
+            accepted[i] = metrics_buffer.submit(
+                d.id, d.seq, pts=d.pts, clicks=d.clicks, w=d.w, h=d.h,
+                time_on_page_seconds=d.time_on_page_seconds, return_count=d.return_count,
+                stored_seq=stored.get(d.id),
+            )
+        acks = [
+            LeadMetricsAck(id=d.id, seq=d.seq, applied=accepted[i])
+            for i, d in enumerate(data.deltas)
+        ]
+        for ack in acks:
+            _count_delta(ack.applied)
+        response.status_code = 202
+    elif data.deltas:
+        applied = await LeadMetricsRepository.append_many(
+            db,
+            [
+                {
+                    "id": d.id,
+                    "seq": d.seq,
+                    "w": d.w,
+                    "h": d.h,
+                    "pts": [list(p) for p in d.pts or []],
+                    "clicks": d.clicks or {},
+                    "seconds": d.time_on_page_seconds,
+                    "return_count": d.return_count,
+                }
+                for d in data.deltas
+            ],
+        )
+        for d in data.deltas:
+            # Повтор (id, seq) внутри пакета подтверждается только один раз
+            acks.append(LeadMetricsAck(id=d.id, seq=d.seq, applied=(d.id, d.seq) in applied))
+            applied.discard((d.id, d.seq))
+            _count_delta(acks[-1].applied)
+    return LeadMetricsBatchResponse(created=created, acks=acks)
 
 
-@router.patch("/{metrics_id}", response_model=LeadMetricsResponse)
-def update_lead_metrics(
+@router.patch("/{metrics_id}", response_model=LeadMetricsResponse | LeadMetricsAck)
+async def update_lead_metrics(
     metrics_id: int,
     data: LeadMetricsUpdate,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_db),
 ):
-    """Обновление метрик (последующие запросы от трекера)."""
-    metrics = LeadMetricsRepository.update(
+    """Обновление метрик (последующие запросы от трекера).
+
+    С полем seq — дозапись новых точек и кликов, ответ — короткое
+    подтверждение вместо всей записи. При включённой отложенной записи
+    пакет ставится в буфер (202) и попадает в БД при ближайшем сбросе.
+    """
+    if data.seq is not None:
+        delta = dict(
+            seq=data.seq,
+            pts=data.pts,
+            clicks=data.clicks,
+            w=data.w,
+            h=data.h,
+            time_on_page_seconds=data.time_on_page_seconds,
+            return_count=data.return_count,
+        )
+        if metrics_buffer.running:
+            stored_seq = None
+            if metrics_buffer.unseen({metrics_id}):
+                # Первый пакет сессии в этом процессе (или после перезапуска):
+                # без проверки пакет несуществующей записи пропал бы при сбросе
+                stored_seq = (await LeadMetricsRepository.last_seqs(db, {metrics_id})).get(metrics_id)
+                if stored_seq is None:
+                    _count_delta(False)
+                    raise HTTPException(status_code=404, detail="Lead metrics not found")
+            accepted = metrics_buffer.submit(metrics_id, **delta, stored_seq=stored_seq)
+            _count_delta(accepted)
+            response.status_code = 202
+            return LeadMetricsAck(id=metrics_id, seq=data.seq, applied=accepted)
+
+        applied = await LeadMetricsRepository.append(db, metrics_id, **delta)
+        _count_delta(applied)
+        if applied is None:
+            raise HTTPException(status_code=404, detail="Lead metrics not found")
+        return LeadMetricsAck(id=metrics_id, seq=data.seq, applied=applied)
+
+    metrics = await LeadMetricsRepository.update(
         db, metrics_id, **data.model_dump(exclude_unset=True)
     )
     if not metrics:
@@ -46,39 +181,110 @@ def update_lead_metrics(
     return metrics
 
 
+def _count_delta(applied: bool) -> None:
+    TRACKER_DELTAS.inc(applied="true" if applied else "false")
+
+
 # ── Защищённые эндпоинты (админ-панель) ─────────────────────────────
 
 
 @router.get("/", response_model=list[LeadMetricsResponse])
-def list_lead_metrics(
+async def list_lead_metrics(
     skip: int = Query(0, ge=0),
     limit: int = Query(200, ge=1, le=1000),
-    db: Session = Depends(get_db),
+    cursor: str | None = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    db: AsyncSession = Depends(get_db),
     admin: Admin = Depends(get_current_admin),
 ):
-    """Список всех записей метрик (для хитмэпа и дашборда)."""
-    return LeadMetricsRepository.get_all(db, skip=skip, limit=limit)
+    """Список всех записей метрик (новые первыми)."""
+    before = decode_cursor(cursor, "id")
+    items = await LeadMetricsRepository.get_all(
+        db, skip=skip, limit=limit, before_id=before[0] if before else None
+    )
+    response = _metrics_serializer.response(items)
+    if items:
+        set_next_cursor(response, items, limit, id=items[-1].id)
+    return response
+
+
+@router.get("/heatmap", response_model=HeatmapResponse)
+async def get_heatmap(
+    date_from: date | None = Query(None, description="Начало периода (UTC, включительно)"),
+    date_to: date | None = Query(None, description="Конец периода (UTC, включительно)"),
+    cols: int = Query(48, ge=1, le=200),
+    rows: int = Query(144, ge=1, le=600),
+    admin: Admin = Depends(get_current_admin),
+):
+    """Хитмэп, посчитанный на сервере: сетка плотности курсора и итоги.
+
+    Агрегация — CPU-работа NumPy, поэтому выполняется в пуле потоков
+    на синхронной сессии и не блокирует event loop.
+    """
+    agg, date_from, date_to = await run_in_threadpool(
+        _build_heatmap_sync, date_from, date_to, cols, rows
+    )
+    return HeatmapResponse(
+        date_from=date_from,
+        date_to=date_to,
+        cols=cols,
+        rows=rows,
+        sessions=agg.sessions,
+        clicks=agg.clicks,
+        total_seconds=agg.total_seconds,
+        buttons=dict(agg.buttons),
+        grid=agg.grid_2d(),
+    )
+
+
+@router.get("/periods", response_model=PeriodAveragesResponse)
+async def get_period_averages(
+    db: AsyncSession = Depends(get_db),
+    admin: Admin = Depends(get_current_admin),
+):
+    """Сессии и среднее время на странице за сутки, 7 и 30 дней.
+
+    Читается из суточных итогов (lead_metrics_daily): стоимость не зависит
+    от числа сессий; данные отстают не больше чем на METRICS_ROLLUP_INTERVAL.
+    """
+    today = datetime.now(timezone.utc).date()
+    totals = await period_totals(db, today)
+    return PeriodAveragesResponse(
+        as_of=today,
+        **{
+            period: PeriodTotals(
+                **t,
+                avg_seconds=round(t["total_seconds"] / t["sessions"], 1) if t["sessions"] else None,
+            )
+            for period, t in totals.items()
+        },
+    )
+
+
+def _build_heatmap_sync(date_from, date_to, cols, rows):
+    with SessionLocal() as db:
+        return build_heatmap(db, date_from, date_to, cols, rows)
 
 
 @router.get("/{metrics_id}", response_model=LeadMetricsResponse)
-def get_lead_metrics(
+async def get_lead_metrics(
     metrics_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin: Admin = Depends(get_current_admin),
 ):
     """Получение метрик по ID."""
-    metrics = LeadMetricsRepository.get_by_id(db, metrics_id)
+    metrics = await LeadMetricsRepository.get_by_id(db, metrics_id)
     if not metrics:
         raise HTTPException(status_code=404, detail="Lead metrics not found")
     return metrics
 
 
 @router.delete("/{metrics_id}", status_code=204)
-def delete_lead_metrics(
+async def delete_lead_metrics(
     metrics_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin: Admin = Depends(get_current_admin),
 ):
     """Удаление метрик."""
-    if not LeadMetricsRepository.delete(db, metrics_id):
+    if not await LeadMetricsRepository.delete(db, metrics_id):
         raise HTTPException(status_code=404, detail="Lead metrics not found")
+    invalidate_heatmap_cache()
@@ -1,7 +1,13 @@
 """Pydantic-схемы для метрик поведения."""
-from datetime import datetime
+from datetime import date, datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
+
+# Ограничение на число точек в одном пакете дозаписи
+MAX_DELTA_POINTS = 5000
+
+# Ограничение на число записей каждого вида в /lead-metrics/batch
+MAX_BATCH_ITEMS = 500
 
 
 class LeadMetricsCreate(BaseModel):
@@ -16,7 +22,13 @@ class LeadMetricsCreate(BaseModel):
 
 
 class LeadMetricsUpdate(BaseModel):
-    """Обновление метрик (трекер каждую секунду)."""
+    """Обновление метрик (трекер каждую секунду).
+
+    Два режима:
+      - полный снимок — buttons_clicked / cursor_hover_data целиком;
+      - дозапись (задан seq) — только новые точки ``pts`` и приращения
+        кликов ``clicks`` с момента предыдущего пакета.
+    """
 
     time_on_page_seconds: int | None = None
     buttons_clicked: str | None = None
@@ -24,6 +36,82 @@ class LeadMetricsUpdate(BaseModel):
     return_count: int | None = None
     raw_metrics: str | None = None
 
+    # Режим дозаписи
+    seq: int | None = Field(None, ge=1, description="Номер пакета, растёт монотонно")
+    w: int | None = Field(None, ge=1, description="Ширина страницы")
+    h: int | None = Field(None, ge=1, description="Высота страницы")
+    pts: list[tuple[int, int]] | None = Field(None, max_length=MAX_DELTA_POINTS)
+    clicks: dict[str, int] | None = None
+
+    @model_validator(mode="after")
+    def check_mode(self):
+        """Поля снимка и дозаписи не смешиваются."""
+        delta_fields = (self.w, self.h, self.pts, self.clicks)
+        if self.seq is None:
+            if any(v is not None for v in delta_fields):
+                raise ValueError("Поля w, h, pts, clicks допустимы только вместе с seq")
+            return self
+        if any(
+            v is not None
+            for v in (self.buttons_clicked, self.cursor_hover_data, self.raw_metrics)
+        ):
+            raise ValueError("В режиме дозаписи передаются pts/clicks, а не полный снимок")
+        if self.clicks and any(v < 0 for v in self.clicks.values()):
+            raise ValueError("Приращения кликов не могут быть отрицательными")
+        return self
+
+
+class LeadMetricsAck(BaseModel):
+    """Подтверждение пакета дозаписи."""
+
+    id: int
+    seq: int
+    applied: bool
+
+
+class LeadMetricsBatchCreate(LeadMetricsCreate):
+    """Новая сессия в пакете; ref — ключ клиента для сопоставления с выданным id."""
+
+    ref: str | None = Field(None, max_length=64)
+
+
+class LeadMetricsDelta(BaseModel):
+    """Пакет дозаписи сессии id (как PATCH с seq)."""
+
+    id: int
+    seq: int = Field(..., ge=1)
+    w: int | None = Field(None, ge=1)
+    h: int | None = Field(None, ge=1)
+    pts: list[tuple[int, int]] | None = Field(None, max_length=MAX_DELTA_POINTS)
+    clicks: dict[str, int] | None = None
+    time_on_page_seconds: int | None = None
+    return_count: int | None = None
+
+    @model_validator(mode="after")
+    def check_clicks(self):
+        if self.clicks and any(v < 0 for v in self.clicks.values()):
+            raise ValueError("Приращения кликов не могут быть отрицательными")
+        return self
+
+
+class LeadMetricsBatchRequest(BaseModel):
+    """Несколько сессий трекера одним запросом (очередь трекера, edge-коллектор)."""
+
+    create: list[LeadMetricsBatchCreate] = Field(default_factory=list, max_length=MAX_BATCH_ITEMS)
+    deltas: list[LeadMetricsDelta] = Field(default_factory=list, max_length=MAX_BATCH_ITEMS)
+
+
+class LeadMetricsBatchCreated(BaseModel):
+    ref: str | None = None
+    id: int
+
+
+class LeadMetricsBatchResponse(BaseModel):
+    """Созданные сессии (в порядке запроса) и подтверждения пакетов дозаписи."""
+
+    created: list[LeadMetricsBatchCreated]
+    acks: list[LeadMetricsAck]
+
 
 class LeadMetricsResponse(BaseModel):
     """Ответ с данными метрик."""
@@ -40,3 +128,35 @@ class LeadMetricsResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class HeatmapResponse(BaseModel):
+    """Агрегированный хитмэп: сетка плотности курсора и итоги за период."""
+
+    date_from: date
+    date_to: date
+    cols: int
+    rows: int
+    sessions: int
+    clicks: int
+    total_seconds: int
+    buttons: dict[str, int]
+    grid: list[list[int]]
+
+
+class PeriodTotals(BaseModel):
+    """Итоги сессий за период и среднее время на странице."""
+
+    sessions: int
+    total_seconds: int
+    clicks: int
+    avg_seconds: float | None = Field(None, description="Среднее время сессии, сек (нет сессий — null)")
+
+
+class PeriodAveragesResponse(BaseModel):
+    """Итоги за сегодня, 7 и 30 суток (UTC, включая сегодняшние)."""
+
+    as_of: date
+    day: PeriodTotals
+    week: PeriodTotals
+    month: PeriodTotals
@@ -0,0 +1,83 @@
+"""Компактное хранение траекторий курсора.
+
+Траектория хранится как ширина/высота страницы (cursor_w, cursor_h) и
+bytea с парами координат uint16 little-endian (x0, y0, x1, y1, ...) —
+4 байта на точку вместо 10–12 символов JSON. Дозапись — конкатенация
+байтов в SQL, чтение — np.frombuffer без разбора текста.
+
+Наружу (API, трекер) траектория по-прежнему отдаётся и принимается как
+JSON ``{"w", "h", "pts": [[x, y], ...]}`` — преобразование здесь.
+"""
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import orjson
+
+# Координаты в пикселях страницы; хранятся без знака, с насыщением
+POINT_DTYPE = np.dtype("<u2")
+MAX_COORD = np.iinfo(POINT_DTYPE).max
+
+
+def encode_points(pts) -> bytes:
+    """Точки [[x, y], ...] или массив (n, 2) → bytea."""
+    arr = np.asarray(pts, dtype=np.float64)
+    if arr.size == 0:
+        return b""
+    arr = arr.reshape(-1, 2)
+    return np.clip(np.rint(arr), 0, MAX_COORD).astype(POINT_DTYPE).tobytes()
+
+
+def decode_points(buf: bytes | None) -> np.ndarray:
+    """bytea → массив (n, 2) uint16 (без копирования)."""
+    if not buf:
+        return np.empty((0, 2), dtype=POINT_DTYPE)
+    n = len(buf) // (2 * POINT_DTYPE.itemsize)
+    return np.frombuffer(buf, dtype=POINT_DTYPE, count=n * 2).reshape(n, 2)
+
+
+def downsample_points(buf: bytes | None, step: int) -> bytes:
+    """Каждая step-я точка траектории (первая точка сохраняется)."""
+    return decode_points(buf)[::max(step, 1)].tobytes()
+
+
+def parse_trail_json(raw: str | None) -> tuple[int | None, int | None, np.ndarray] | None:
+    """JSON-траектория трекера → (w, h, точки (n, 2)); None, если это не траектория."""
+    if not raw:
+        return None
+    try:
+        data = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    pts = data.get("pts") or []
+    try:
+        arr = np.asarray(pts, dtype=np.float64)
+    except (ValueError, TypeError):
+        arr = None
+    if arr is None or arr.ndim != 2 or arr.shape[1] < 2:
+        # Рваный или повреждённый массив — берём только корректные пары
+        arr = np.asarray(
+            [p[:2] for p in pts if isinstance(p, list) and len(p) >= 2
+             and all(isinstance(v, (int, float)) for v in p[:2])],
+            dtype=np.float64,
+        ).reshape(-1, 2)
+    arr = arr[:, :2]
+    arr = arr[np.all(np.isfinite(arr), axis=1)]
+    return _dimension(data.get("w")), _dimension(data.get("h")), arr
+
+
+def trail_to_json(w: int | None, h: int | None, buf: bytes | None) -> str:
+    """Траектория в формате трекера (JSON-строка)."""
+    return orjson.dumps(
+        {"w": w, "h": h, "pts": decode_points(buf)}, option=orjson.OPT_SERIALIZE_NUMPY
+    ).decode()
+
+
+def _dimension(value) -> int | None:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        return None
+    return min(int(value), 2**31 - 1)
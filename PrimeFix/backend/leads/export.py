@@ -0,0 +1,109 @@
+"""Потоковая выгрузка лидов со скорингом (CSV / NDJSON).
+
+Лиды читаются серверным курсором (stream + yield_per) по возрастанию id,
+каждая пачка кодируется в текст и сразу отдаётся клиенту — память
+процесса не зависит от размера выгрузки. Генератор открывает собственную
+сессию: сессия запроса (get_db) закрывается раньше, чем начинается
+передача тела ответа.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import select, text
+
+from backend.core.database import AsyncSessionLocal
+from backend.leads.model import Lead
+from backend.leads.schema import LeadBase, LeadScoreInfo
+
+# Формат → Content-Type
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+LEAD_COLUMNS = ("id", "created_at", *LeadBase.model_fields)
+SCORE_COLUMNS = tuple(LeadScoreInfo.model_fields)
+
+# Строк в одной пачке курсора
+_CHUNK_ROWS = 1000
+
+
+def _export_query(
+    date_from: date | None, date_to: date | None, temperatures: list[str] | None
+):
+    stmt = select(*(getattr(Lead, name) for name in LEAD_COLUMNS + SCORE_COLUMNS))
+    if date_from is not None:
+        stmt = stmt.where(
+            Lead.created_at >= datetime.combine(date_from, time.min, tzinfo=timezone.utc)
+        )
+    if date_to is not None:
+        end = datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=timezone.utc)
+        stmt = stmt.where(Lead.created_at < end)
+    if temperatures:
+        stmt = stmt.where(Lead.temperature.in_(temperatures))
+    return stmt.order_by(Lead.id).execution_options(yield_per=_CHUNK_ROWS)
+
+
+async def _iter_partitions(stmt) -> AsyncIterator[list]:
+    async with AsyncSessionLocal() as db:
+        # Выгрузка длится дольше statement_timeout запросов API
+        await db.execute(text("SET LOCAL statement_timeout = 0"))
+        result = await db.stream(stmt)
+        async for partition in result.mappings().partitions():
+            yield partition
+
+
+async def export_csv(
+    date_from: date | None = None,
+    date_to: date | None = None,
+    temperatures: list[str] | None = None,
+) -> AsyncIterator[str]:
+    """CSV с заголовком; BOM — чтобы Excel открыл кириллицу в UTF-8."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write("\ufeff")
+    writer.writerow(LEAD_COLUMNS + SCORE_COLUMNS)
+    yield buf.getvalue()
+
+    async for partition in _iter_partitions(_export_query(date_from, date_to, temperatures)):
+        buf.seek(0)
+        buf.truncate()
+        for row in partition:
+            writer.writerow(
+                [_csv_value(row[name]) for name in LEAD_COLUMNS + SCORE_COLUMNS]
+            )
+        yield buf.getvalue()
+
+
+async def export_ndjson(
+    date_from: date | None = None,
+    date_to: date | None = None,
+    temperatures: list[str] | None = None,
+) -> AsyncIterator[str]:
+    """По объекту JSON на строку, в форме ответа /leads/scored/."""
+    async for partition in _iter_partitions(_export_query(date_from, date_to, temperatures)):
+        lines = []
+        for row in partition:
+            item = {name: row[name] for name in LEAD_COLUMNS}
+            item["created_at"] = _iso(item["created_at"])
+            item["scoring"] = {name: row[name] for name in SCORE_COLUMNS}
+            lines.append(json.dumps(item, ensure_ascii=False))
+        lines.append("")
+        yield "\n".join(lines)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return _iso(value)
+    return value
+
+
+def _iso(value: datetime | None) -> str | None:
+    return value.isoformat() if value is not None else None
@@ -0,0 +1,103 @@
+"""Сводные счётчики лидов для дашборда админки.
+
+Распределение по температуре, отделу, услуге и периоду создания считается
+одним запросом: GROUP BY GROUPING SETS по каждому измерению плюс общий
+итог; в строках периодов температура разложена через count(*) FILTER.
+Какому измерению принадлежит строка, показывает битовая маска GROUPING().
+Ответ — несколько сотен байт по всей таблице вместо выгрузки лидов.
+
+Результат кэшируется в памяти процесса на LEADS_FACETS_CACHE_TTL секунд
+(0 — без кэша): дашборд запрашивает сводку при каждом открытии, а точность
+до секунд ему не нужна.
+"""
+from __future__ import annotations
+
+import time
+from datetime import date, datetime, time as dtime, timedelta, timezone
+
+from sqlalchemy import Date, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.core.config import get_settings
+from backend.leads.model import Lead
+
+# Ключ в ответе → значение temperature (leads/scoring.py)
+TEMPERATURES = {"hot": "горячий", "warm": "тёплый", "cold": "холодный"}
+
+# Измерения в порядке аргументов GROUPING(): бит измерения строки равен 0
+_DIMENSIONS = ("temperature", "department", "service", "period")
+_ALL_BITS = (1 << len(_DIMENSIONS)) - 1
+
+# Сколько разных наборов параметров держать в кэше
+_CACHE_MAX_KEYS = 64
+
+_cache: dict[tuple, tuple[float, dict]] = {}
+
+
+def _facets_query(bucket: str, date_from: date | None, date_to: date | None):
+    period = func.date_trunc(bucket, func.timezone("UTC", Lead.created_at)).cast(Date)
+    base = select(Lead.temperature, Lead.department, Lead.service, period.label("period"))
+    if date_from is not None:
+        base = base.where(
+            Lead.created_at >= datetime.combine(date_from, dtime.min, tzinfo=timezone.utc)
+        )
+    if date_to is not None:
+        end = datetime.combine(date_to + timedelta(days=1), dtime.min, tzinfo=timezone.utc)
+        base = base.where(Lead.created_at < end)
+    leads = base.subquery()
+    dims = [leads.c[name] for name in _DIMENSIONS]
+    return select(
+        func.grouping(*dims).label("grp"),
+        *dims,
+        func.count().label("leads"),
+        *(
+            func.count().filter(leads.c.temperature == value).label(key)
+            for key, value in TEMPERATURES.items()
+        ),
+    ).group_by(func.grouping_sets(*(tuple_(dim) for dim in dims), tuple_()))
+
+
+async def lead_facets(
+    db: AsyncSession,
+    bucket: str = "month",
+    date_from: date | None = None,
+    date_to: date | None = None,
+) -> dict:
+    """Счётчики лидов по измерениям (поля LeadFacetsResponse)."""
+    ttl = get_settings().LEADS_FACETS_CACHE_TTL
+    key = (bucket, date_from, date_to)
+    if ttl > 0:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+    rows = (await db.execute(_facets_query(bucket, date_from, date_to))).all()
+    facets: dict = {"bucket": bucket, "total": 0, "created": []}
+    facets.update({name: [] for name in _DIMENSIONS[:-1]})
+    for row in rows:
+        if row.grp == _ALL_BITS:
+            facets["total"] = row.leads
+        elif row.grp == _ALL_BITS ^ _bit("period"):
+            if row.period is None:
+                continue
+            facets["created"].append(
+                {"period": row.period, "count": row.leads,
+                 **{k: getattr(row, k) for k in TEMPERATURES}}
+            )
+        else:
+            name = next(d for d in _DIMENSIONS if row.grp == _ALL_BITS ^ _bit(d))
+            facets[name].append({"value": getattr(row, name), "count": row.leads})
+    for name in _DIMENSIONS[:-1]:
+        facets[name].sort(key=lambda item: -item["count"])
+    facets["created"].sort(key=lambda item: item["period"])
+
+    if ttl > 0:
+        if len(_cache) >= _CACHE_MAX_KEYS:
+            _cache.clear()
+        _cache[key] = (time.monotonic() + ttl, facets)
+    return facets
+
+
+def _bit(name: str) -> int:
+    """Бит измерения в маске GROUPING() (первый аргумент — старший)."""
+    return 1 << (len(_DIMENSIONS) - 1 - _DIMENSIONS.index(name))
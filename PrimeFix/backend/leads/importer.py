@@ -0,0 +1,166 @@
+"""Массовый импорт лидов из CSV / NDJSON (перенос из CRM, других лендингов).
+
+Файл читается построчно, каждая запись проверяется схемой LeadCreate и
+ограничениями длины колонок таблицы leads. Корректные записи копятся
+пачками, скорятся одним вызовом score_leads и загружаются в PostgreSQL
+через COPY ... FROM STDIN; ошибочные пропускаются и попадают в отчёт с
+номером записи. Все пачки загружаются в одной транзакции: при сбое БД
+не импортируется ничего.
+
+COPY доступен только в psycopg2, поэтому импорт выполняется синхронно
+(в пуле потоков, на синхронном движке — как построение хитмэпа).
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass, field
+from typing import BinaryIO
+
+from pydantic import ValidationError
+from sqlalchemy.engine import Engine
+
+from backend.leads.model import Lead
+from backend.leads.schema import LeadCreate
+from backend.leads.scoring import LeadScore, score_leads
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+LEAD_FIELDS = tuple(LeadCreate.model_fields)
+SCORE_FIELDS = tuple(LeadScore.__dataclass_fields__)
+
+# Записей в одной пачке COPY
+_BATCH_SIZE = 2000
+
+# Сколько ошибок возвращать в отчёте (остальные только считаются)
+MAX_REPORTED_ERRORS = 1000
+
+# Ограничения длины строковых колонок (VARCHAR(n)) — иначе COPY упадёт целиком
+_MAX_LENGTHS = {
+    name: Lead.__table__.c[name].type.length
+    for name in LEAD_FIELDS
+    if getattr(Lead.__table__.c[name].type, "length", None)
+}
+
+_COPY_SQL = (
+    f"COPY leads ({', '.join(LEAD_FIELDS + SCORE_FIELDS)}) "
+    "FROM STDIN WITH (FORMAT csv)"
+)
+
+
+class ImportFormatError(ValueError):
+    """Файл не читается целиком (кодировка, заголовок CSV, формат)."""
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    failed: int = 0
+    errors: list[dict] = field(default_factory=list)
+
+    def add_error(self, row: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+
+# ── Чтение записей ───────────────────────────────────────────────────
+
+def _iter_csv(text: io.TextIOBase) -> Iterator[tuple[int, dict | str]]:
+    reader = csv.DictReader(text)
+    header = reader.fieldnames or []
+    missing = [
+        name for name, f in LeadCreate.model_fields.items()
+        if f.is_required() and name not in header
+    ]
+    if missing:
+        raise ImportFormatError(f"CSV header must contain: {', '.join(missing)}")
+    for number, row in enumerate(reader, start=1):
+        if None in row:
+            yield number, "more fields than in the header"
+        else:
+            yield number, row
+
+
+def _iter_ndjson(text: io.TextIOBase) -> Iterator[tuple[int, dict | str]]:
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield number, f"invalid JSON: {exc.msg}"
+            continue
+        yield number, data if isinstance(data, dict) else "expected a JSON object"
+
+
+def _validate(data: dict) -> dict | str:
+    """Запись → поля LeadCreate или текст ошибки."""
+    cleaned = {}
+    for key, value in data.items():
+        if isinstance(value, str):
+            value = value.strip()
+        # Пустая ячейка CSV — отсутствующее поле
+        if key in LeadCreate.model_fields and value not in ("", None):
+            cleaned[key] = value
+    try:
+        lead = LeadCreate.model_validate(cleaned).model_dump()
+    except ValidationError as exc:
+        return "; ".join(
+            f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in exc.errors()
+        )
+    for name, limit in _MAX_LENGTHS.items():
+        if lead[name] is not None and len(lead[name]) > limit:
+            return f"{name}: longer than {limit} characters"
+    return lead
+
+
+# ── Загрузка ─────────────────────────────────────────────────────────
+
+def _copy_batch(cursor, leads: list[dict]) -> None:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for lead, sc in zip(leads, score_leads(leads)):
+        scores = asdict(sc)
+        writer.writerow(
+            [lead[name] for name in LEAD_FIELDS] + [scores[name] for name in SCORE_FIELDS]
+        )
+    buf.seek(0)
+    cursor.copy_expert(_COPY_SQL, buf)
+
+
+def import_leads(engine: Engine, fileobj: BinaryIO, fmt: str) -> ImportReport:
+    """Импорт файла в таблицу leads. Возвращает отчёт с ошибками по записям."""
+    if fmt not in IMPORT_FORMATS:
+        raise ImportFormatError(f"Unsupported format: {fmt}")
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    records = _iter_csv(text) if fmt == "csv" else _iter_ndjson(text)
+    report = ImportReport()
+    batch: list[dict] = []
+
+    with engine.begin() as conn:
+        cursor = conn.connection.cursor()
+        try:
+            for number, data in records:
+                lead = _validate(data) if isinstance(data, dict) else data
+                if isinstance(lead, str):
+                    report.add_error(number, lead)
+                    continue
+                batch.append(lead)
+                if len(batch) >= _BATCH_SIZE:
+                    _copy_batch(cursor, batch)
+                    report.imported += len(batch)
+                    batch = []
+            if batch:
+                _copy_batch(cursor, batch)
+                report.imported += len(batch)
+        except UnicodeDecodeError:
+            raise ImportFormatError("File must be UTF-8 encoded") from None
+        except csv.Error as exc:
+            raise ImportFormatError(f"Malformed CSV: {exc}") from None
+        finally:
+            cursor.close()
+            text.detach()
+    return report
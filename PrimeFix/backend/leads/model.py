@@ -1,14 +1,38 @@
 """Модель заявки (лид)."""
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Boolean, Column, Computed, Integer, String, Text, DateTime, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 
 from backend.core.database import Base
 
+# Конфигурация полнотекстового поиска (стемминг русского языка)
+SEARCH_CONFIG = "russian"
+
+# Поля поиска по весам: ФИО важнее ниши и услуги, те — свободного текста
+_SEARCH_FIELDS = (
+    ("A", ("surname", "name", "patronymic")),
+    ("B", ("niche", "task_type", "service", "product_interest")),
+    ("C", ("business_info", "comments")),
+)
+
+# Выражение вектора; concat_ws не подходит — он не IMMUTABLE
+SEARCH_VECTOR_SQL = " || ".join(
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', "
+    + " || ' ' || ".join(f"coalesce({name}, '')" for name in names)
+    + f"), '{weight}')"
+    for weight, names in _SEARCH_FIELDS
+)
+
 
 class Lead(Base):
     """Таблица заявок от «тёплых» клиентов."""
 
     __tablename__ = "leads"
+    __table_args__ = (
+        # ORDER BY score DESC, id DESC — обратный проход по индексу
+        Index("ix_leads_score_id", "score", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(255), nullable=False)
@@ -31,3 +55,17 @@ class Lead(Base):
     convenient_time = Column(String(255), nullable=True)
     service = Column(String(255), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Результат скоринга (leads/scoring.py), пересчитывается при сохранении
+    score = Column(Integer, nullable=True)
+    temperature = Column(String(20), nullable=True)
+    priority = Column(String(20), nullable=True)
+    needs_personal_manager = Column(Boolean, nullable=True)
+    department = Column(String(50), nullable=True)
+    summary = Column(Text, nullable=True)
+
+    # Вектор для GET /leads/search; вычисляется самой БД при любой записи
+    # (форма, PATCH, импорт через COPY). В выборки лидов не загружается.
+    search_vector = deferred(
+        Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True))
+    )
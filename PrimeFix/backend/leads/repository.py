@@ -1,45 +1,155 @@
 """Репозиторий заявок (CRUD)."""
-from sqlalchemy.orm import Session
+import json
+from dataclasses import asdict
 
-from backend.leads.model import Lead
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.leads.model import SEARCH_CONFIG, Lead
+from backend.leads.scoring import LeadScore, score_lead
+
+# Пакетная запись скоринга одним UPDATE; строки, где результат не
+# изменился, не переписываются.
+_UPDATE_SCORES_SQL = text("""
+    UPDATE leads AS l SET
+        score = b.score,
+        temperature = b.temperature,
+        priority = b.priority,
+        needs_personal_manager = b.needs_personal_manager,
+        department = b.department,
+        summary = b.summary
+    FROM jsonb_to_recordset(CAST(:batch AS jsonb)) AS b(
+        id integer, score integer, temperature text, priority text,
+        needs_personal_manager boolean, department text, summary text
+    )
+    WHERE l.id = b.id
+      AND (l.score, l.temperature, l.priority, l.needs_personal_manager,
+           l.department, l.summary)
+          IS DISTINCT FROM
+          (b.score, b.temperature, b.priority, b.needs_personal_manager,
+           b.department, b.summary)
+""")
 
 
 class LeadRepository:
     """CRUD-операции для Lead."""
 
     @staticmethod
-    def create(db: Session, **kwargs) -> Lead:
+    async def create(db: AsyncSession, **kwargs) -> Lead:
         lead = Lead(**kwargs)
+        apply_score(lead)
         db.add(lead)
-        db.commit()
-        db.refresh(lead)
+        await db.commit()
+        await db.refresh(lead)
         return lead
 
     @staticmethod
-    def get_by_id(db: Session, lead_id: int) -> Lead | None:
-        return db.query(Lead).filter(Lead.id == lead_id).first()
+    async def get_by_id(db: AsyncSession, lead_id: int) -> Lead | None:
+        return await db.scalar(select(Lead).where(Lead.id == lead_id))
+
+    @staticmethod
+    async def get_all(
+        db: AsyncSession, skip: int = 0, limit: int = 100, after_id: int | None = None
+    ) -> list[Lead]:
+        """Лиды по возрастанию id; after_id — keyset-продолжение вместо skip."""
+        stmt = select(Lead).order_by(Lead.id)
+        if after_id is not None:
+            stmt = stmt.where(Lead.id > after_id)
+        elif skip:
+            stmt = stmt.offset(skip)
+        result = await db.scalars(stmt.limit(limit))
+        return list(result)
+
+    @staticmethod
+    async def get_scored(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        after: tuple[int, int] | None = None,
+    ) -> list[Lead]:
+        """Лиды по убыванию сохранённого балла (горячие первыми).
+
+        Лиды без балла (score IS NULL — скоринг ещё не записан) в список не
+        входят: ответу нужен результат скоринга, а ключу курсора — число.
+        after — (score, id) последнего лида предыдущей страницы.
+        """
+        stmt = (
+            select(Lead)
+            .where(Lead.score.is_not(None))
+            .order_by(Lead.score.desc(), Lead.id.desc())
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(Lead.score, Lead.id) < tuple_(*after))
+        elif skip:
+            stmt = stmt.offset(skip)
+        result = await db.scalars(stmt.limit(limit))
+        return list(result)
 
     @staticmethod
-    def get_all(db: Session, skip: int = 0, limit: int = 100) -> list[Lead]:
-        return db.query(Lead).offset(skip).limit(limit).all()
+    async def search(
+        db: AsyncSession,
+        query: str,
+        limit: int = 50,
+        after: tuple[float, int] | None = None,
+    ) -> list[tuple[Lead, float]]:
+        """Полнотекстовый поиск: (лид, ранг) по убыванию ранга.
+
+        query — в синтаксисе websearch_to_tsquery («слово», "фраза", -исключить, or);
+        after — (rank, id) последнего лида предыдущей страницы.
+        """
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        rank = func.ts_rank(Lead.search_vector, tsquery)
+        stmt = (
+            select(Lead, rank.label("rank"))
+            .where(Lead.search_vector.bool_op("@@")(tsquery))
+            .order_by(rank.desc(), Lead.id.desc())
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(rank, Lead.id) < tuple_(*after))
+        result = await db.execute(stmt.limit(limit))
+        return [(lead, rank) for lead, rank in result]
 
     @staticmethod
-    def update(db: Session, lead_id: int, **kwargs) -> Lead | None:
-        lead = LeadRepository.get_by_id(db, lead_id)
+    async def update(db: AsyncSession, lead_id: int, **kwargs) -> Lead | None:
+        lead = await LeadRepository.get_by_id(db, lead_id)
         if not lead:
             return None
         for key, value in kwargs.items():
             if hasattr(lead, key):
                 setattr(lead, key, value)
-        db.commit()
-        db.refresh(lead)
+        apply_score(lead)
+        await db.commit()
+        await db.refresh(lead)
         return lead
 
     @staticmethod
-    def delete(db: Session, lead_id: int) -> bool:
-        lead = LeadRepository.get_by_id(db, lead_id)
+    async def bulk_update_scores(
+        db: AsyncSession, scores: list[tuple[int, LeadScore]]
+    ) -> int:
+        """Запись скоринга пачки лидов. Возвращает число изменённых строк."""
+        if not scores:
+            return 0
+        batch = [{"id": lead_id, **asdict(sc)} for lead_id, sc in scores]
+        result = await db.execute(_UPDATE_SCORES_SQL, {"batch": json.dumps(batch)})
+        await db.commit()
+        return result.rowcount
+
+    @staticmethod
+    async def delete(db: AsyncSession, lead_id: int) -> bool:
+        lead = await LeadRepository.get_by_id(db, lead_id)
         if not lead:
             return False
-        db.delete(lead)
-        db.commit()
+        await db.delete(lead)
+        await db.commit()
         return True
+
+
+def apply_score(lead: Lead) -> None:
+    """Пересчитать скоринг и записать результат в колонки лида."""
+    sc = score_lead(lead)
+    lead.score = sc.score
+    lead.temperature = sc.temperature
+    lead.priority = sc.priority
+    lead.needs_personal_manager = sc.needs_personal_manager
+    lead.department = sc.department
+    lead.summary = sc.summary
@@ -0,0 +1,149 @@
+"""Массовый пересчёт скоринга лидов после изменения правил (CLI).
+
+Запуск из контейнера backend:
+
+    python -m backend.leads.rescore [--after-id N] [--chunk-size 2000] [--workers K]
+
+Лиды читаются потоково серверным курсором (stream + yield_per) в порядке id и
+скорятся чанками в пуле процессов по числу доступных ядер; результаты
+пишутся пакетным UPDATE (неизменившиеся строки не трогаются). Чанки
+записываются строго по порядку, поэтому напечатанный «last id» — точка
+продолжения: прерванный запуск возобновляется с --after-id.
+
+Сессии — AsyncSessionLocal с statement_timeout запросов API, поэтому в каждой
+транзакции пересчёта он снимается SET LOCAL (как в leads/export.py):
+чтение курсора идёт весь запуск, а UPDATE чанка под нагрузкой может
+не уложиться в лимит.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.core.database import AsyncSessionLocal, async_engine
+from backend.leads.model import Lead
+from backend.leads.repository import LeadRepository
+from backend.leads.scoring import LeadScore, score_leads
+
+logger = logging.getLogger("backend.leads.rescore")
+
+# Колонки, нужные скорингу (без тяжёлых полей результата)
+_SCORING_COLUMNS = (
+    "id", "business_info", "budget", "niche", "company_size", "task_volume",
+    "role", "business_size", "need_volume", "deadline", "task_type",
+    "product_interest", "contact_method", "preferred_contact_method",
+    "convenient_time", "comments", "service",
+)
+
+# Как часто печатать прогресс, секунд
+_PROGRESS_EVERY = 5.0
+
+
+async def _disable_statement_timeout(db: AsyncSession) -> None:
+    """Снять statement_timeout до конца текущей транзакции."""
+    await db.execute(text("SET LOCAL statement_timeout = 0"))
+
+
+def _score_chunk(rows: list[dict]) -> list[tuple[int, LeadScore]]:
+    """Скоринг чанка в дочернем процессе."""
+    return [(row["id"], sc) for row, sc in zip(rows, score_leads(rows))]
+
+
+def _available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+async def rescore(
+    after_id: int = 0, chunk_size: int = 2000, workers: int | None = None
+) -> int:
+    """Пересчитать скоринг всех лидов с id > after_id. Возвращает последний id."""
+    workers = workers or _available_cores()
+    columns = [getattr(Lead, name) for name in _SCORING_COLUMNS]
+    stmt = (
+        select(*columns)
+        .where(Lead.id > after_id)
+        .order_by(Lead.id)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    loop = asyncio.get_running_loop()
+    in_flight: deque[tuple[int, asyncio.Future]] = deque()
+    processed = changed = 0
+    last_id = after_id
+    started = last_report = time.monotonic()
+
+    async def drain_one(writer) -> None:
+        nonlocal processed, changed, last_id, last_report
+        chunk_last_id, future = in_flight.popleft()
+        scores = await future
+        # bulk_update_scores фиксирует транзакцию — SET LOCAL на каждую
+        await _disable_statement_timeout(writer)
+        changed += await LeadRepository.bulk_update_scores(writer, scores)
+        processed += len(scores)
+        last_id = chunk_last_id
+
+        now = time.monotonic()
+        if now - last_report >= _PROGRESS_EVERY:
+            last_report = now
+            logger.info(
+                "processed=%d changed=%d rate=%.0f leads/s last_id=%d",
+                processed, changed, processed / (now - started), last_id,
+            )
+
+    logger.info("Rescoring leads with id > %d (workers=%d, chunk=%d)", after_id, workers, chunk_size)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            async with AsyncSessionLocal() as reader, AsyncSessionLocal() as writer:
+                await _disable_statement_timeout(reader)
+                result = await reader.stream(stmt)
+                async for partition in result.mappings().partitions():
+                    rows = [dict(row) for row in partition]
+                    future = loop.run_in_executor(pool, _score_chunk, rows)
+                    in_flight.append((rows[-1]["id"], future))
+                    # Не держим в памяти больше, чем нужно для загрузки пула
+                    if len(in_flight) >= workers * 2:
+                        await drain_one(writer)
+                while in_flight:
+                    await drain_one(writer)
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logger.warning("Interrupted; resume with --after-id %d", last_id)
+        raise
+    finally:
+        await async_engine.dispose()
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        "Done: processed=%d changed=%d in %.1fs (%.0f leads/s), last_id=%d",
+        processed, changed, elapsed, processed / elapsed if elapsed else 0, last_id,
+    )
+    return last_id
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Пересчёт скоринга лидов")
+    parser.add_argument("--after-id", type=int, default=0, help="продолжить после этого id")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="лидов в чанке")
+    parser.add_argument("--workers", type=int, default=None, help="процессов (по умолчанию — число ядер)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(rescore(args.after_id, args.chunk_size, args.workers))
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
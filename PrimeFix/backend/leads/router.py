@@ -1,92 +1,187 @@
 """API-роуты для заявок.
 
 GET /leads/scored/ — защищённый JWT, возвращает лиды с анализом,
-отсортированные по температуре (горячие первыми).
-Остальные эндпоинты — публичные (форма заявки).
+отсортированные по сохранённому баллу (горячие первыми).
+GET /leads/search — полнотекстовый поиск по тем же лидам (JWT).
+GET /leads/facets — сводные счётчики для дашборда (JWT).
+GET /leads/export и POST /leads/import — выгрузка и массовая загрузка
+(тоже JWT). Остальные эндпоинты — публичные (форма заявки).
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from dataclasses import asdict
+from datetime import date, datetime, timezone
+from typing import Literal
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.auth.dependencies import get_current_admin
 from backend.auth.model import Admin
-from backend.core.database import get_db
+from backend.core.database import engine, get_db
+from backend.core.pagination import decode_cursor, set_next_cursor
+from backend.core.responses import ListSerializer
+from backend.leads.export import EXPORT_MEDIA_TYPES, export_csv, export_ndjson
+from backend.leads.facets import lead_facets
+from backend.leads.importer import ImportFormatError, import_leads
 from backend.leads.repository import LeadRepository
 from backend.leads.schema import (
     LeadCreate,
+    LeadFacetsResponse,
+    LeadImportResponse,
     LeadResponse,
-    LeadScoreInfo,
     LeadScoredResponse,
     LeadUpdate,
 )
-from backend.leads.scoring import score_lead
 
 router = APIRouter(prefix="/leads", tags=["leads"])
 
+_lead_serializer = ListSerializer(LeadResponse)
+_scored_serializer = ListSerializer(LeadScoredResponse)
+
 
 # ── Публичные ────────────────────────────────────────────────────────
 
 
 @router.post("/", response_model=LeadResponse)
-def create_lead(data: LeadCreate, db: Session = Depends(get_db)):
+async def create_lead(data: LeadCreate, db: AsyncSession = Depends(get_db)):
     """Создание новой заявки (форма на сайте)."""
-    return LeadRepository.create(db, **data.model_dump())
+    return await LeadRepository.create(db, **data.model_dump())
 
 
 # ── Защищённые (JWT) ─────────────────────────────────────────────────
 
 
 @router.get("/scored/", response_model=list[LeadScoredResponse])
-def list_scored_leads(
+async def list_scored_leads(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db),
+    cursor: str | None = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    db: AsyncSession = Depends(get_db),
     admin: Admin = Depends(get_current_admin),
 ):
     """Список лидов с интеллектуальным анализом (горячие первыми)."""
-    leads = LeadRepository.get_all(db, skip=0, limit=500)
-
-    scored = []
-    for lead in leads:
-        sc = score_lead(lead)
-        lead_dict = LeadResponse.model_validate(lead).model_dump()
-        lead_dict["scoring"] = LeadScoreInfo(
-            score=sc.score,
-            temperature=sc.temperature,
-            priority=sc.priority,
-            needs_personal_manager=sc.needs_personal_manager,
-            department=sc.department,
-            summary=sc.summary,
-        )
-        scored.append(lead_dict)
-
-    # Сортировка: горячие первыми
-    scored.sort(key=lambda x: x["scoring"].score, reverse=True)
-    return scored[skip : skip + limit]
+    after = decode_cursor(cursor, "score", "id")
+    leads = await LeadRepository.get_scored(db, skip=skip, limit=limit, after=after)
+    response = _scored_serializer.response(leads)
+    if leads:
+        set_next_cursor(response, leads, limit, score=leads[-1].score, id=leads[-1].id)
+    return response
+
+
+@router.get("/search", response_model=list[LeadScoredResponse])
+async def search_leads(
+    q: str = Query(..., min_length=1, max_length=200, description="Поисковый запрос"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    db: AsyncSession = Depends(get_db),
+    admin: Admin = Depends(get_current_admin),
+):
+    """Поиск по ФИО, нише, услуге и свободному тексту заявки (самые релевантные первыми)."""
+    after = decode_cursor(cursor, "rank", "id", float_keys=("rank",))
+    found = await LeadRepository.search(db, q, limit=limit, after=after)
+    response = _scored_serializer.response(lead for lead, _ in found)
+    if found:
+        last, rank = found[-1]
+        set_next_cursor(response, found, limit, rank=rank, id=last.id)
+    return response
+
+
+@router.get("/facets", response_model=LeadFacetsResponse)
+async def get_lead_facets(
+    bucket: Literal["day", "week", "month"] = Query("month", description="Шаг периодов created"),
+    date_from: date | None = Query(None, description="Созданы не раньше (UTC)"),
+    date_to: date | None = Query(None, description="Созданы не позже (UTC, включительно)"),
+    db: AsyncSession = Depends(get_db),
+    admin: Admin = Depends(get_current_admin),
+):
+    """Число лидов по температуре, отделу, услуге и периоду создания (один запрос)."""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    return await lead_facets(db, bucket, date_from, date_to)
+
+
+@router.get("/export")
+async def export_leads(
+    fmt: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    date_from: date | None = Query(None, description="created_at с этой даты (UTC), включительно"),
+    date_to: date | None = Query(None, description="created_at по эту дату (UTC), включительно"),
+    temperature: list[str] | None = Query(None, description="температура лида, можно несколько"),
+    admin: Admin = Depends(get_current_admin),
+):
+    """Потоковая выгрузка всех лидов со скорингом (CSV или NDJSON)."""
+    export = export_csv if fmt == "csv" else export_ndjson
+    filename = f"leads-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{fmt}"
+    return StreamingResponse(
+        export(date_from, date_to, temperature),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/import", response_model=LeadImportResponse)
+async def import_leads_file(
+    file: UploadFile = File(..., description="CSV с заголовком или NDJSON, поля LeadCreate"),
+    fmt: Literal["csv", "ndjson"] | None = Query(
+        None, alias="format", description="по умолчанию — по расширению файла"
+    ),
+    admin: Admin = Depends(get_current_admin),
+):
+    """Массовый импорт лидов: COPY пачками, скоринг пачками, отчёт по ошибочным записям."""
+    fmt = fmt or _guess_import_format(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Unknown file format, pass ?format=csv|ndjson")
+    try:
+        report = await run_in_threadpool(import_leads, engine, file.file, fmt)
+    except ImportFormatError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return LeadImportResponse(**asdict(report))
+
+
+def _guess_import_format(filename: str | None) -> str | None:
+    suffix = (filename or "").rsplit(".", 1)[-1].lower()
+    if suffix == "csv":
+        return "csv"
+    if suffix in ("ndjson", "jsonl"):
+        return "ndjson"
+    return None
 
 
 @router.get("/", response_model=list[LeadResponse])
-def list_leads(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Список заявок (без скоринга)."""
-    return LeadRepository.get_all(db, skip=skip, limit=limit)
+async def list_leads(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Список заявок (без скоринга), по возрастанию id."""
+    after = decode_cursor(cursor, "id")
+    leads = await LeadRepository.get_all(
+        db, skip=skip, limit=limit, after_id=after[0] if after else None
+    )
+    response = _lead_serializer.response(leads)
+    if leads:
+        set_next_cursor(response, leads, limit, id=leads[-1].id)
+    return response
 
 
 @router.get("/{lead_id}", response_model=LeadResponse)
-def get_lead(lead_id: int, db: Session = Depends(get_db)):
-    lead = LeadRepository.get_by_id(db, lead_id)
+async def get_lead(lead_id: int, db: AsyncSession = Depends(get_db)):
+    lead = await LeadRepository.get_by_id(db, lead_id)
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
     return lead
 
 
 @router.patch("/{lead_id}", response_model=LeadResponse)
-def update_lead(lead_id: int, data: LeadUpdate, db: Session = Depends(get_db)):
-    lead = LeadRepository.update(db, lead_id, **data.model_dump(exclude_unset=True))
+async def update_lead(lead_id: int, data: LeadUpdate, db: AsyncSession = Depends(get_db)):
+    lead = await LeadRepository.update(db, lead_id, **data.model_dump(exclude_unset=True))
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
     return lead
 
 
 @router.delete("/{lead_id}", status_code=204)
-def delete_lead(lead_id: int, db: Session = Depends(get_db)):
-    if not LeadRepository.delete(db, lead_id):
+async def delete_lead(lead_id: int, db: AsyncSession = Depends(get_db)):
+    if not await LeadRepository.delete(db, lead_id):
         raise HTTPException(status_code=404, detail="Lead not found")
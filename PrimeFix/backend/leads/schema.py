@@ -1,7 +1,8 @@
 """Pydantic-схемы для заявок."""
-from datetime import datetime
+from datetime import date, datetime
+from typing import Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 
 
 class LeadBase(BaseModel):
@@ -75,3 +76,56 @@ class LeadScoredResponse(LeadResponse):
     """Лид с результатами интеллектуального анализа."""
 
     scoring: LeadScoreInfo
+
+    @model_validator(mode="before")
+    @classmethod
+    def _scoring_from_columns(cls, data):
+        # Результаты скоринга хранятся в колонках самого лида
+        if isinstance(data, (dict, BaseModel)):
+            return data
+        values = {name: getattr(data, name) for name in LeadResponse.model_fields}
+        values["scoring"] = {name: getattr(data, name) for name in LeadScoreInfo.model_fields}
+        return values
+
+
+class LeadImportError(BaseModel):
+    """Ошибка в записи импортируемого файла (row — номер записи с 1)."""
+
+    row: int
+    error: str
+
+
+class LeadImportResponse(BaseModel):
+    """Итог массового импорта."""
+
+    imported: int
+    failed: int
+    errors: list[LeadImportError]
+
+
+class FacetCount(BaseModel):
+    """Число лидов с данным значением поля (null — поле не заполнено)."""
+
+    value: str | None
+    count: int
+
+
+class PeriodFacet(BaseModel):
+    """Лиды, созданные за период (начало периода, UTC), по температуре."""
+
+    period: date
+    count: int
+    hot: int
+    warm: int
+    cold: int
+
+
+class LeadFacetsResponse(BaseModel):
+    """Сводка лидов для дашборда: итог и распределения по полям."""
+
+    bucket: Literal["day", "week", "month"]
+    total: int
+    temperature: list[FacetCount]
+    department: list[FacetCount]
+    service: list[FacetCount]
+    created: list[PeriodFacet]
@@ -7,12 +7,18 @@
 
 Возвращается словарь с рекомендациями: приоритет, нужен ли
 персональный менеджер, рекомендуемый отдел и пояснение.
+
+Для массовой обработки (миграции, пересчёт, импорт) — score_leads().
 """
 from __future__ import annotations
 
 import re
+import time
+from collections.abc import Iterable, Mapping
 from dataclasses import dataclass
 
+from backend.core.instrumentation import LEAD_SCORING_SECONDS, LEADS_SCORED
+
 
 # ── Результат скоринга ───────────────────────────────────────────────
 
@@ -70,23 +76,85 @@ _MEDIUM_COMPANY = [
 ]
 
 
-# ── Основная функция скоринга ────────────────────────────────────────
+# Словари для подстрочного поиска (бюджет, объём, отдел)
+_BUDGET_MENTION = ["тыс", "руб", "₽", "$", "€", "бюджет"]
+_LARGE_VOLUME = ["больш", "масштаб", "комплекс", "постоянн", "регулярн", "крупн"]
+_MEDIUM_VOLUME = ["средн", "несколько", "ряд"]
+_CONSULTING = ["аудит", "консульт", "анализ", "стратег", "оптимиз"]
+_SUPPORT = ["обслуж", "ремонт", "поддерж", "сервис", "аварий", "технич"]
+
+# Поля, по которым считается полнота заявки
+_COMPLETENESS_FIELDS = (
+    "business_info", "budget", "niche", "company_size", "task_volume",
+    "role", "business_size", "need_volume", "deadline", "task_type",
+    "product_interest", "contact_method", "preferred_contact_method",
+    "convenient_time", "comments", "service",
+)
+
+
+# ── Скомпилированные правила ─────────────────────────────────────────
+#
+# Каждая категория — одно регулярное выражение-альтернация: поиск идёт
+# одним проходом по тексту в C-коде re вместо цикла по словам.
+
+def _keywords(words: list[str]) -> re.Pattern:
+    return re.compile("|".join(re.escape(w) for w in words))
+
+
+def _patterns(patterns: list[tuple]) -> re.Pattern:
+    return re.compile("|".join(f"(?:{p})" for p, _ in patterns), re.IGNORECASE)
+
+
+_RE_URGENT = _keywords(_URGENT_WORDS)
+_RE_MEDIUM_DEADLINE = _keywords(_MEDIUM_DEADLINE)
+_RE_HIGH_BUDGET = _patterns(_HIGH_BUDGET_PATTERNS)
+_RE_MID_BUDGET = _patterns(_MID_BUDGET_PATTERNS)
+_RE_BUDGET_MENTION = _keywords(_BUDGET_MENTION)
+_RE_DECISION_MAKERS = _keywords(_DECISION_MAKERS)
+_RE_MIDDLE_ROLES = _keywords(_MIDDLE_ROLES)
+_RE_LARGE_COMPANY = _keywords(_LARGE_COMPANY)
+_RE_MEDIUM_COMPANY = _keywords(_MEDIUM_COMPANY)
+_RE_LARGE_VOLUME = _keywords(_LARGE_VOLUME)
+_RE_MEDIUM_VOLUME = _keywords(_MEDIUM_VOLUME)
+_RE_CONSULTING = _keywords(_CONSULTING)
+_RE_SUPPORT = _keywords(_SUPPORT)
+
+
+# ── Основные функции скоринга ────────────────────────────────────────
 
 def score_lead(lead) -> LeadScore:
     """Вычислить скоринг лида. lead — ORM-объект или dict-like."""
-    g = _field  # shortcut
+    started = time.perf_counter()
+    result = _score_fields(_extract_fields(lead))
+    _count_scored(1, started)
+    return result
 
+
+def score_leads(leads: Iterable) -> list[LeadScore]:
+    """Скоринг пачки лидов (поля каждого лида извлекаются один раз)."""
+    started = time.perf_counter()
+    results = [_score_fields(_extract_fields(lead)) for lead in leads]
+    _count_scored(len(results), started)
+    return results
+
+
+def _count_scored(n: int, started: float) -> None:
+    LEADS_SCORED.inc(n)
+    LEAD_SCORING_SECONDS.inc(time.perf_counter() - started)
+
+
+def _score_fields(f: dict[str, str | None]) -> LeadScore:
     points = 0
     reasons: list[str] = []
 
     # 1. Срочность дедлайна (0–25)
-    deadline = g(lead, "deadline")
+    deadline = f["deadline"]
     if deadline:
         dl = deadline.lower()
-        if _any_match(dl, _URGENT_WORDS):
+        if _RE_URGENT.search(dl):
             points += 25
             reasons.append("срочный дедлайн")
-        elif _any_match(dl, _MEDIUM_DEADLINE):
+        elif _RE_MEDIUM_DEADLINE.search(dl):
             points += 12
             reasons.append("умеренный дедлайн")
         else:
@@ -94,67 +162,61 @@ def score_lead(lead) -> LeadScore:
             reasons.append("указан дедлайн")
 
     # 2. Бюджет (0–25)
-    budget = g(lead, "budget")
+    budget = f["budget"]
     if budget:
         bl = budget.lower()
-        if _any_pattern(bl, _HIGH_BUDGET_PATTERNS):
+        if _RE_HIGH_BUDGET.search(bl):
             points += 25
             reasons.append("крупный бюджет")
-        elif _any_pattern(bl, _MID_BUDGET_PATTERNS):
+        elif _RE_MID_BUDGET.search(bl):
             points += 14
             reasons.append("средний бюджет")
-        elif any(w in bl for w in ("тыс", "руб", "₽", "$", "€", "бюджет")):
+        elif _RE_BUDGET_MENTION.search(bl):
             points += 7
             reasons.append("бюджет указан")
 
     # 3. Роль заполняющего (0–15)
-    role = g(lead, "role")
+    role = f["role"]
+    is_decision_maker = False
     if role:
         rl = role.lower()
-        if _any_match(rl, _DECISION_MAKERS):
+        is_decision_maker = _RE_DECISION_MAKERS.search(rl) is not None
+        if is_decision_maker:
             points += 15
             reasons.append("ЛПР (лицо, принимающее решения)")
-        elif _any_match(rl, _MIDDLE_ROLES):
+        elif _RE_MIDDLE_ROLES.search(rl):
             points += 8
             reasons.append("средний менеджмент")
         else:
             points += 3
 
     # 4. Размер компании (0–10)
-    company = g(lead, "company_size") or g(lead, "business_size") or ""
+    company = f["company_size"] or f["business_size"] or ""
     if company:
         cl = company.lower()
-        if _any_match(cl, _LARGE_COMPANY):
+        if _RE_LARGE_COMPANY.search(cl):
             points += 10
             reasons.append("крупная компания")
-        elif _any_match(cl, _MEDIUM_COMPANY):
+        elif _RE_MEDIUM_COMPANY.search(cl):
             points += 5
             reasons.append("средняя компания")
         else:
             points += 2
 
     # 5. Объём задач / потребность (0–10)
-    volume = g(lead, "task_volume") or g(lead, "need_volume") or ""
+    volume = f["task_volume"] or f["need_volume"] or ""
     if volume:
         vl = volume.lower()
-        if any(w in vl for w in ("больш", "масштаб", "комплекс", "постоянн", "регулярн", "крупн")):
+        if _RE_LARGE_VOLUME.search(vl):
             points += 10
             reasons.append("большой объём")
-        elif any(w in vl for w in ("средн", "несколько", "ряд")):
+        elif _RE_MEDIUM_VOLUME.search(vl):
             points += 5
         else:
             points += 2
 
     # 6. Полнота заполнения (0–15)
-    filled = sum(
-        1 for f in [
-            "business_info", "budget", "niche", "company_size", "task_volume",
-            "role", "business_size", "need_volume", "deadline", "task_type",
-            "product_interest", "contact_method", "preferred_contact_method",
-            "convenient_time", "comments", "service",
-        ]
-        if g(lead, f)
-    )
+    filled = sum(1 for name in _COMPLETENESS_FIELDS if f[name])
     fill_score = min(15, round(filled * 1.2))
     points += fill_score
     if filled >= 10:
@@ -176,10 +238,10 @@ def score_lead(lead) -> LeadScore:
         priority = "низкий"
 
     # Персональный менеджер
-    needs_pm = score >= 60 or _any_match((role or "").lower(), _DECISION_MAKERS)
+    needs_pm = score >= 60 or is_decision_maker
 
     # Рекомендуемый отдел
-    department = _recommend_department(lead)
+    department = _recommend_department(f)
 
     summary = "; ".join(reasons) if reasons else "мало данных для анализа"
 
@@ -195,33 +257,30 @@ def score_lead(lead) -> LeadScore:
 
 # ── Вспомогательные функции ──────────────────────────────────────────
 
-def _field(obj, name: str) -> str | None:
-    """Получить поле из ORM-объекта или dict."""
-    val = getattr(obj, name, None) if hasattr(obj, name) else obj.get(name)
-    if val and isinstance(val, str) and val.strip():
-        return val.strip()
-    return None
-
-
-def _any_match(text: str, keywords: list[str]) -> bool:
-    return any(kw in text for kw in keywords)
-
-
-def _any_pattern(text: str, patterns: list[tuple]) -> bool:
-    for pattern, _ in patterns:
-        if re.search(pattern, text, re.IGNORECASE):
-            return True
-    return False
+def _extract_fields(obj) -> dict[str, str | None]:
+    """Все поля скоринга из ORM-объекта или dict: строка без пробелов по краям или None."""
+    if isinstance(obj, Mapping):
+        get = obj.get
+    else:
+        def get(name):
+            return getattr(obj, name, None)
+
+    fields: dict[str, str | None] = {}
+    for name in _COMPLETENESS_FIELDS:
+        val = get(name)
+        if val and isinstance(val, str):
+            val = val.strip()
+            fields[name] = val or None
+        else:
+            fields[name] = None
+    return fields
 
 
-def _recommend_department(lead) -> str:
-    task = (_field(lead, "task_type") or "").lower()
-    service = (_field(lead, "service") or "").lower()
-    niche = (_field(lead, "niche") or "").lower()
-    combined = f"{task} {service} {niche}"
+def _recommend_department(f: dict[str, str | None]) -> str:
+    combined = f"{f['task_type'] or ''} {f['service'] or ''} {f['niche'] or ''}".lower()
 
-    if any(w in combined for w in ("аудит", "консульт", "анализ", "стратег", "оптимиз")):
+    if _RE_CONSULTING.search(combined):
         return "консалтинг"
-    if any(w in combined for w in ("обслуж", "ремонт", "поддерж", "сервис", "аварий", "технич")):
+    if _RE_SUPPORT.search(combined):
         return "техподдержка"
     return "продажи"
@@ -6,11 +6,22 @@ PrimeFix API — точка входа приложения.
 import os
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from backend.core.database import Base, engine
+from backend.core.database import async_engine, engine
+from backend.core.instrumentation import (
+    PROMETHEUS_CONTENT_TYPE,
+    InstrumentationMiddleware,
+    instrument_pools,
+    render_metrics,
+)
+from backend.db.indexes import start_index_build
 from backend.db.migrations import run_migrations
+from backend.lead_metrics.buffer import metrics_buffer
+from backend.lead_metrics.partitions import partition_maintainer
+from backend.lead_metrics.retention import retention_job
+from backend.lead_metrics.rollup import rollup_refresher
 
 # Импорт роутеров
 from backend.auth.router import router as auth_router
@@ -18,6 +29,7 @@ from backend.leads.router import router as leads_router
 from backend.lead_metrics.router import router as lead_metrics_router
 from backend.services.router import router as services_router
 from backend.services.admin_router import router as admin_services_router
+from backend.admin.router import router as admin_router
 
 # Импорт моделей для регистрации в SQLAlchemy metadata
 import backend.auth.model  # noqa: F401
@@ -28,10 +40,19 @@ import backend.services.model  # noqa: F401
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Создание таблиц и применение миграций при старте."""
-    Base.metadata.create_all(bind=engine)
+    """Миграции, фоновое построение индексов и задачи метрик при старте;
+    сброс буфера и итогов метрик при остановке."""
     run_migrations(engine)
+    start_index_build(engine)
+    partition_maintainer.start(engine)
+    metrics_buffer.start()
+    rollup_refresher.start()
+    retention_job.start()
     yield
+    await retention_job.stop()
+    await metrics_buffer.stop()
+    await rollup_refresher.stop()
+    await partition_maintainer.stop()
 
 
 _disable_docs = os.environ.get("DISABLE_API_DOCS", "").strip().lower() in ("1", "true", "yes")
@@ -51,7 +72,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+# Последним — внешний слой: учитываются и ответы CORS-middleware
+app.add_middleware(InstrumentationMiddleware)
+instrument_pools(api=async_engine.sync_engine, background=engine)
 
 # Регистрация роутеров
 app.include_router(auth_router, prefix="/api")
@@ -59,9 +84,16 @@ app.include_router(leads_router, prefix="/api")
 app.include_router(lead_metrics_router, prefix="/api")
 app.include_router(services_router, prefix="/api")
 app.include_router(admin_services_router, prefix="/api")
+app.include_router(admin_router, prefix="/api")
 
 
 @app.get("/api/health")
 def health():
     """Проверка работоспособности приложения."""
     return {"status": "ok"}
+
+
+@app.get("/api/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики процесса для Prometheus (снаружи закрыто в Nginx)."""
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
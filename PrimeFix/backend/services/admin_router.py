@@ -1,70 +1,87 @@
 """API админа: CRUD услуг (защищённый JWT)."""
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.auth.dependencies import get_current_admin
 from backend.auth.model import Admin
 from backend.core.database import get_db
+from backend.core.pagination import decode_cursor, set_next_cursor
+from backend.core.responses import ListSerializer
+from backend.services.cache import invalidate_services_cache
 from backend.services.repository import ServiceRepository
 from backend.services.schema import ServiceCreate, ServiceResponse, ServiceUpdate
 
 router = APIRouter(prefix="/admin/services", tags=["admin-services"])
 
+_service_serializer = ListSerializer(ServiceResponse)
+
 
 @router.get("/", response_model=list[ServiceResponse])
-def list_services(
-    db: Session = Depends(get_db),
+async def list_services(
+    db: AsyncSession = Depends(get_db),
     admin: Admin = Depends(get_current_admin),
     skip: int = Query(0, ge=0),
     limit: int = Query(200, ge=1, le=1000),
+    cursor: str | None = Query(None, description="X-Next-Cursor предыдущей страницы"),
 ):
     """Получение списка всех услуг (для админ-панели)."""
-    return ServiceRepository.get_all(db, skip=skip, limit=limit)
+    after = decode_cursor(cursor, "id")
+    services = await ServiceRepository.get_all(
+        db, skip=skip, limit=limit, after_id=after[0] if after else None
+    )
+    response = _service_serializer.response(services)
+    if services:
+        set_next_cursor(response, services, limit, id=services[-1].id)
+    return response
 
 
 @router.post("/", response_model=ServiceResponse)
-def create_service(
+async def create_service(
     data: ServiceCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin: Admin = Depends(get_current_admin),
 ):
     """Создание новой услуги."""
-    return ServiceRepository.create(db, name=data.name, description=data.description)
+    s = await ServiceRepository.create(db, name=data.name, description=data.description)
+    invalidate_services_cache()
+    return s
 
 
 @router.get("/{service_id}", response_model=ServiceResponse)
-def get_service(
+async def get_service(
     service_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin: Admin = Depends(get_current_admin),
 ):
     """Получение услуги по ID."""
-    s = ServiceRepository.get_by_id(db, service_id)
+    s = await ServiceRepository.get_by_id(db, service_id)
     if not s:
         raise HTTPException(status_code=404, detail="Service not found")
     return s
 
 
 @router.patch("/{service_id}", response_model=ServiceResponse)
-def update_service(
+async def update_service(
     service_id: int,
     data: ServiceUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin: Admin = Depends(get_current_admin),
 ):
     """Обновление услуги."""
-    s = ServiceRepository.update(db, service_id, **data.model_dump(exclude_unset=True))
+    s = await ServiceRepository.update(db, service_id, **data.model_dump(exclude_unset=True))
     if not s:
         raise HTTPException(status_code=404, detail="Service not found")
+    invalidate_services_cache()
     return s
 
 
 @router.delete("/{service_id}", status_code=204)
-def delete_service(
+async def delete_service(
     service_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin: Admin = Depends(get_current_admin),
 ):
     """Удаление услуги."""
-    if not ServiceRepository.delete(db, service_id):
+    if not await ServiceRepository.delete(db, service_id):
         raise HTTPException(status_code=404, detail="Service not found")
+    invalidate_services_cache()
@@ -0,0 +1,66 @@
+"""Кэш публичного списка услуг.
+
+GET /api/services/ запрашивается при каждом открытии главной страницы,
+а каталог меняется только через админку. Готовое JSON-тело и его ETag
+хранятся в памяти процесса; admin_router сбрасывает кэш после создания,
+изменения и удаления услуги. В остальных воркерах запись живёт не дольше
+SERVICES_CACHE_TTL секунд — этим же ограничен max-age для браузера и Nginx.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+from dataclasses import dataclass
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.core.config import get_settings
+from backend.core.responses import ListSerializer
+from backend.services.repository import ServiceRepository
+from backend.services.schema import ServicePublic
+
+# Публичный список отдаётся целиком (как и раньше — до 500 услуг)
+_PUBLIC_LIMIT = 500
+
+_serializer = ListSerializer(ServicePublic)
+
+
+@dataclass(frozen=True)
+class ServicesCatalog:
+    """Сериализованный список услуг."""
+
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+_catalog: ServicesCatalog | None = None
+_generation = 0
+
+
+async def get_public_catalog(db: AsyncSession) -> ServicesCatalog:
+    """Список услуг из кэша или из БД (с заполнением кэша)."""
+    global _catalog
+    catalog = _catalog
+    if catalog is not None and catalog.expires_at > time.monotonic():
+        return catalog
+
+    generation = _generation
+    services = await ServiceRepository.get_all(db, limit=_PUBLIC_LIMIT)
+    body = _serializer.dump(services)
+    catalog = ServicesCatalog(
+        body=body,
+        etag='"' + hashlib.sha1(body).hexdigest()[:20] + '"',
+        expires_at=time.monotonic() + get_settings().SERVICES_CACHE_TTL,
+    )
+    # Пока шёл запрос, админ мог изменить каталог — такой результат не кэшируем
+    if generation == _generation:
+        _catalog = catalog
+    return catalog
+
+
+def invalidate_services_cache() -> None:
+    """Сбросить кэш после изменения каталога."""
+    global _catalog, _generation
+    _generation += 1
+    _catalog = None
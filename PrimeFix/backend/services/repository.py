@@ -1,5 +1,6 @@
 """Репозиторий услуг (CRUD)."""
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.services.model import Service
 
@@ -8,38 +9,46 @@ class ServiceRepository:
     """CRUD-операции для Service."""
 
     @staticmethod
-    def create(db: Session, name: str, description: str | None = None) -> Service:
+    async def create(db: AsyncSession, name: str, description: str | None = None) -> Service:
         s = Service(name=name, description=description)
         db.add(s)
-        db.commit()
-        db.refresh(s)
+        await db.commit()
+        await db.refresh(s)
         return s
 
     @staticmethod
-    def get_by_id(db: Session, service_id: int) -> Service | None:
-        return db.query(Service).filter(Service.id == service_id).first()
+    async def get_by_id(db: AsyncSession, service_id: int) -> Service | None:
+        return await db.scalar(select(Service).where(Service.id == service_id))
 
     @staticmethod
-    def get_all(db: Session, skip: int = 0, limit: int = 500) -> list[Service]:
-        return db.query(Service).order_by(Service.id).offset(skip).limit(limit).all()
+    async def get_all(
+        db: AsyncSession, skip: int = 0, limit: int = 500, after_id: int | None = None
+    ) -> list[Service]:
+        stmt = select(Service).order_by(Service.id)
+        if after_id is not None:
+            stmt = stmt.where(Service.id > after_id)
+        elif skip:
+            stmt = stmt.offset(skip)
+        result = await db.scalars(stmt.limit(limit))
+        return list(result)
 
     @staticmethod
-    def update(db: Session, service_id: int, **kwargs) -> Service | None:
-        s = ServiceRepository.get_by_id(db, service_id)
+    async def update(db: AsyncSession, service_id: int, **kwargs) -> Service | None:
+        s = await ServiceRepository.get_by_id(db, service_id)
         if not s:
             return None
         for key, value in kwargs.items():
             if hasattr(s, key):
                 setattr(s, key, value)
-        db.commit()
-        db.refresh(s)
+        await db.commit()
+        await db.refresh(s)
         return s
 
     @staticmethod
-    def delete(db: Session, service_id: int) -> bool:
-        s = ServiceRepository.get_by_id(db, service_id)
+    async def delete(db: AsyncSession, service_id: int) -> bool:
+        s = await ServiceRepository.get_by_id(db, service_id)
         if not s:
             return False
-        db.delete(s)
-        db.commit()
+        await db.delete(s)
+        await db.commit()
         return True
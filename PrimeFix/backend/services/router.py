@@ -1,16 +1,29 @@
-"""Публичный API: список услуг для формы заявки."""
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+"""Публичный API: список услуг для формы заявки.
 
+Ответ отдаётся из кэша процесса (services/cache.py) с ETag и
+Cache-Control: браузер и Nginx переиспользуют его без обращения к backend,
+а повторный запрос с If-None-Match получает 304 без тела.
+"""
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.core.config import get_settings
 from backend.core.database import get_db
-from backend.services.repository import ServiceRepository
+from backend.services.cache import get_public_catalog
 from backend.services.schema import ServicePublic
 
 router = APIRouter(prefix="/services", tags=["services"])
 
 
 @router.get("/", response_model=list[ServicePublic])
-def list_services(db: Session = Depends(get_db)):
+async def list_services(request: Request, db: AsyncSession = Depends(get_db)):
     """Вернуть все услуги для выбора в форме."""
-    return ServiceRepository.get_all(db, skip=0, limit=500)
-
+    catalog = await get_public_catalog(db)
+    headers = {
+        "ETag": catalog.etag,
+        "Cache-Control": f"public, max-age={get_settings().SERVICES_CACHE_TTL}",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if catalog.etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=catalog.body, media_type="application/json", headers=headers)
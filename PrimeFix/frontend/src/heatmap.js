@@ -1,13 +1,17 @@
 /**
  * Хитмэп-визуализация + дашборд для lead_metrics.
  *
+ * Плотность курсора считает сервер (GET /api/lead-metrics/heatmap):
+ * браузер получает готовую сетку и итоги, а не сырые траектории.
+ *
  * Ключевой момент: после загрузки iframe инъектируем CSS,
  * который убирает min-height:100vh (ломает layout в iframe)
  * и делает форму полупрозрачной, чтобы точки были видны НА ней.
  */
 
 const API_AUTH = '/api/auth/login';
-const API_METRICS = '/api/lead-metrics/';
+const API_HEATMAP = '/api/lead-metrics/heatmap';
+const API_PERIODS = '/api/lead-metrics/periods';
 
 // ── DOM ──────────────────────────────────────────────────────────────
 
@@ -160,77 +164,61 @@ frame.addEventListener('load', () => {
 
 // ── Load data & render ───────────────────────────────────────────────
 
-async function loadAndRender() {
-  try {
-    const r = await fetch(API_METRICS + '?limit=1000', {
-      headers: { Authorization: 'Bearer ' + token },
-    });
-    if (r.status === 401) {
-      token = '';
-      sessionStorage.removeItem('heatmap_token');
-      loginOverlay.classList.remove('hidden');
-      return;
-    }
-    if (!r.ok) return;
-
-    const records = await r.json();
-    allPoints = [];
-
-    const now = new Date();
-    const dayAgo = new Date(now - 24 * 60 * 60 * 1000);
-    const weekAgo = new Date(now - 7 * 24 * 60 * 60 * 1000);
-    const monthAgo = new Date(now - 30 * 24 * 60 * 60 * 1000);
-
-    let totalSessions = 0;
-    const clicksRaw = {};
-    // Для подсчёта среднего по периодам: {сессий, сумма_секунд}
-    const period = { day: { n: 0, s: 0 }, week: { n: 0, s: 0 }, month: { n: 0, s: 0 } };
-
-    records.forEach((rec) => {
-      totalSessions++;
-      const t = rec.time_on_page_seconds || 0;
-      const createdAt = rec.created_at ? new Date(rec.created_at) : null;
-
-      if (createdAt) {
-        if (createdAt >= dayAgo)   { period.day.n++;   period.day.s += t; }
-        if (createdAt >= weekAgo)  { period.week.n++;  period.week.s += t; }
-        if (createdAt >= monthAgo) { period.month.n++; period.month.s += t; }
-      }
+/** Разрешение сетки плотности, которую считает сервер. */
+const GRID_COLS = 48;
+const GRID_ROWS = 144;
 
-      // Клики
-      if (rec.buttons_clicked) {
-        try {
-          const c = JSON.parse(rec.buttons_clicked);
-          for (const [k, v] of Object.entries(c))
-            clicksRaw[k] = (clicksRaw[k] || 0) + v;
-        } catch {}
-      }
+async function fetchHeatmap(params) {
+  return fetchAuthorized(API_HEATMAP + '?' + new URLSearchParams(params));
+}
 
-      // Позиции курсора
-      if (!rec.cursor_hover_data) return;
-      let parsed;
-      try { parsed = JSON.parse(rec.cursor_hover_data); } catch { return; }
+async function fetchAuthorized(url) {
+  const r = await fetch(url, {
+    headers: { Authorization: 'Bearer ' + token },
+  });
+  if (r.status === 401) {
+    token = '';
+    sessionStorage.removeItem('heatmap_token');
+    loginOverlay.classList.remove('hidden');
+    return null;
+  }
+  return r.ok ? r.json() : null;
+}
 
-      const w = parsed.w || 1920;
-      const h = parsed.h || 3500;
-      const pts = parsed.pts || [];
+async function loadAndRender() {
+  try {
+    const data = await fetchHeatmap({ cols: GRID_COLS, rows: GRID_ROWS });
+    if (!data) return;
 
-      pts.forEach((pt) => {
-        if (Array.isArray(pt) && pt.length >= 2) {
-          allPoints.push({ xPct: pt[0] / w, yPct: pt[1] / h });
+    // Ячейки сетки → точки с весом (центр ячейки)
+    allPoints = [];
+    let maxCount = 0;
+    data.grid.forEach((row) => row.forEach((n) => { if (n > maxCount) maxCount = n; }));
+    data.grid.forEach((row, iy) => {
+      row.forEach((n, ix) => {
+        if (n > 0) {
+          allPoints.push({
+            xPct: (ix + 0.5) / data.cols,
+            yPct: (iy + 0.5) / data.rows,
+            weight: n / maxCount,
+          });
         }
       });
     });
 
+    // Средние по периодам — из суточных итогов на сервере
+    const periods = await fetchAuthorized(API_PERIODS);
+    const { day, week, month } = periods || {};
+
     // ── Dashboard ───────────────────
-    dSessions.textContent = totalSessions;
-    fillPeriodCard(dAvgDay, dAvgDaySub, period.day, 'сегодня');
-    fillPeriodCard(dAvgWeek, dAvgWeekSub, period.week, 'за 7 дней');
-    fillPeriodCard(dAvgMonth, dAvgMonthSub, period.month, 'за 30 дней');
+    dSessions.textContent = data.sessions;
+    fillPeriodCard(dAvgDay, dAvgDaySub, day, 'сегодня');
+    fillPeriodCard(dAvgWeek, dAvgWeekSub, week, 'за 7 дней');
+    fillPeriodCard(dAvgMonth, dAvgMonthSub, month, 'за 30 дней');
 
     // Клики: человекочитаемые названия
     const humanized = {};
-    for (const [raw, count] of Object.entries(clicksRaw)) {
+    for (const [raw, count] of Object.entries(data.buttons)) {
       const label = humanizeClickLabel(raw);
       if (label) humanized[label] = (humanized[label] || 0) + count;
     }
@@ -256,14 +244,14 @@ async function loadAndRender() {
 }
 
 function fillPeriodCard(valEl, subEl, data, periodLabel) {
-  if (data.n === 0) {
+  if (!data || data.sessions === 0) {
     valEl.textContent = '—';
     subEl.textContent = 'нет данных ' + periodLabel;
     return;
   }
-  const avg = Math.round(data.s / data.n);
+  const avg = Math.round(data.total_seconds / data.sessions);
   valEl.textContent = fmtTime(avg);
-  subEl.textContent = data.n + ' сессий ' + periodLabel;
+  subEl.textContent = data.sessions + ' сессий ' + periodLabel;
 }
 
 function fmtTime(sec) {
@@ -338,9 +326,10 @@ function renderHeatmap() {
   allPoints.forEach((pt) => {
     const x = pt.xPct * cw;
     const y = pt.yPct * ch;
+    const a = Math.min(1, alphaPerPoint + 0.6 * pt.weight);
     const grad = sCtx.createRadialGradient(x, y, 0, x, y, radius);
-    grad.addColorStop(0, 'rgba(0,0,0,' + alphaPerPoint + ')');
-    grad.addColorStop(0.5, 'rgba(0,0,0,' + alphaPerPoint * 0.5 + ')');
+    grad.addColorStop(0, 'rgba(0,0,0,' + a + ')');
+    grad.addColorStop(0.5, 'rgba(0,0,0,' + a * 0.5 + ')');
     grad.addColorStop(1, 'rgba(0,0,0,0)');
     sCtx.fillStyle = grad;
     sCtx.fillRect(x - radius, y - radius, radius * 2, radius * 2);
@@ -27,7 +27,7 @@ initScrollAnimations();
 let servicesList = [];
 
 /**
- * Загрузка услуг из БД (GET /api/services) и заполнение <select id="service">.
+ * Загрузка услуг из БД (GET /api/services/) и заполнение <select id="service">.
  * В конец добавляется пункт «Другое». При выборе услуги под полем показывается описание.
  */
 async function loadServices() {
@@ -37,7 +37,7 @@ async function loadServices() {
   while (select.options.length > 1) select.remove(1);
   servicesList = [];
   try {
-    const res = await fetch('/api/services');
+    const res = await fetch('/api/services/');
     if (res.ok) {
       const data = await res.json();
       if (Array.isArray(data)) {
@@ -8,7 +8,9 @@
  *
  * Данные записываются в таблицу lead_metrics.
  * Первый запрос: POST /api/lead-metrics/ (создаёт запись, получает id).
- * Последующие:  PATCH /api/lead-metrics/{id}.
+ * Последующие:  PATCH /api/lead-metrics/{id} в режиме дозаписи —
+ * только новые точки и приращения кликов с номером пакета seq.
+ * Неподтверждённый пакет повторяется с тем же seq (сервер отбросит дубль).
  */
 
 // Не запускать внутри iframe (хитмэп-страница)
@@ -21,12 +23,17 @@ if (window === window.top) {
 
     var recordId = null;
     var timeOnPage = 0;
-    var buttonsClicked = {};
-    var cursorPoints = [];
+    var lastSeq = 0;       // последний выданный номер пакета
+    var pending = emptyBatch();   // накоплено, ещё не отправлено
+    var inflight = null;          // отправлено, ждём подтверждения
     var lastX = 0;
     var lastY = 0;
     var sending = false;
 
+    function emptyBatch() {
+      return { seq: 0, pts: [], clicks: {} };
+    }
+
     // ── Курсор ──────────────────────────────────────
 
     document.addEventListener('mousemove', function (e) {
@@ -45,7 +52,7 @@ if (window === window.top) {
 
     document.addEventListener('click', function (e) {
       var label = getLabel(e.target);
-      if (label) buttonsClicked[label] = (buttonsClicked[label] || 0) + 1;
+      if (label) pending.clicks[label] = (pending.clicks[label] || 0) + 1;
     }, true);
 
     function getLabel(el) {
@@ -63,49 +70,119 @@ if (window === window.top) {
 
     // ── Данные ──────────────────────────────────────
 
-    function payload() {
+    function pageSize() {
+      return {
+        w: document.documentElement.scrollWidth || window.innerWidth,
+        h: document.documentElement.scrollHeight || window.innerHeight,
+      };
+    }
+
+    /** Пакет к отправке: неподтверждённый или новый из накопленного. */
+    function takeBatch() {
+      if (!inflight) {
+        inflight = pending;
+        inflight.seq = ++lastSeq;
+        pending = emptyBatch();
+      }
+      return inflight;
+    }
+
+    /** Полный снимок для POST (запись ещё не создана). */
+    function snapshot(batch) {
+      var size = pageSize();
       return {
         time_on_page_seconds: timeOnPage,
-        buttons_clicked: JSON.stringify(buttonsClicked),
-        cursor_hover_data: JSON.stringify({
-          w: document.documentElement.scrollWidth || window.innerWidth,
-          h: document.documentElement.scrollHeight || window.innerHeight,
-          pts: cursorPoints,
-        }),
+        buttons_clicked: JSON.stringify(batch.clicks),
+        cursor_hover_data: JSON.stringify({ w: size.w, h: size.h, pts: batch.pts }),
         return_count: 0,
       };
     }
 
+    /** Тело PATCH в режиме дозаписи. */
+    function delta(batch) {
+      var size = pageSize();
+      return {
+        seq: batch.seq,
+        w: size.w,
+        h: size.h,
+        pts: batch.pts,
+        clicks: batch.clicks,
+        time_on_page_seconds: timeOnPage,
+      };
+    }
+
+    function mergeBatches(a, b) {
+      var clicks = {};
+      [a.clicks, b.clicks].forEach(function (c) {
+        for (var k in c) clicks[k] = (clicks[k] || 0) + c[k];
+      });
+      return { seq: a.seq, pts: a.pts.concat(b.pts), clicks: clicks };
+    }
+
+    function isEmpty(batch) {
+      return !batch.pts.length && !Object.keys(batch.clicks).length;
+    }
+
     // ── Отправка ────────────────────────────────────
 
-    function send() {
+    function send(keepalive) {
       if (sending) return;
       sending = true;
-      var url = recordId === null ? API + '/' : API + '/' + recordId;
-      var method = recordId === null ? 'POST' : 'PATCH';
+      var batch = takeBatch();
+      var create = recordId === null;
 
-      fetch(url, {
-        method: method,
+      fetch(create ? API + '/' : API + '/' + recordId, {
+        method: create ? 'POST' : 'PATCH',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(payload()),
+        body: JSON.stringify(create ? snapshot(batch) : delta(batch)),
+        keepalive: !!keepalive,
       })
         .then(function (r) { return r.ok ? r.json() : null; })
-        .then(function (d) { if (d && d.id && !recordId) recordId = d.id; })
+        .then(function (d) {
+          if (!d) return;
+          if (create && d.id) recordId = d.id;
+          if (inflight === batch) inflight = null;
+        })
         .catch(function () {})
         .finally(function () { sending = false; });
     }
 
+    function patchFinal(batch) {
+      fetch(API + '/' + recordId, {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(delta(batch)),
+        keepalive: true,
+      }).catch(function () {});
+    }
+
+    /**
+     * Отправка при уходе со страницы. Колбэки промисов после beforeunload
+     * уже не выполнятся, поэтому всё уходит сразу и с keepalive; повторы
+     * отсекает сервер по seq.
+     */
     function sendFinal() {
-      var data = payload();
-      if (recordId) {
-        fetch(API + '/' + recordId, {
-          method: 'PATCH',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify(data),
-          keepalive: true,
-        }).catch(function () {});
-      } else if (navigator.sendBeacon) {
-        navigator.sendBeacon(API + '/', new Blob([JSON.stringify(data)], { type: 'application/json' }));
+      if (recordId === null) {
+        // Запись не создана — один снимок всего накопленного
+        var all = inflight ? mergeBatches(inflight, pending) : pending;
+        pending = emptyBatch();
+        if (!sending) {
+          inflight = all;
+          send(true);
+        } else if (navigator.sendBeacon) {
+          navigator.sendBeacon(API + '/', new Blob([JSON.stringify(snapshot(all))], { type: 'application/json' }));
+        }
+        return;
+      }
+
+      // Неподтверждённый пакет — повтор с тем же seq (если он уже дошёл,
+      // сервер отбросит дубль), накопленное после него — свой пакет с новым seq
+      if (inflight) patchFinal(inflight);
+      if (!isEmpty(pending)) {
+        var tail = pending;
+        tail.seq = ++lastSeq;
+        pending = emptyBatch();
+        patchFinal(tail);
       }
     }
 
@@ -113,7 +190,7 @@ if (window === window.top) {
 
     var timer = setInterval(function () {
       timeOnPage++;
-      cursorPoints.push([Math.round(lastX), Math.round(lastY)]);
+      pending.pts.push([Math.round(lastX), Math.round(lastY)]);
       send();
     }, TICK);
 